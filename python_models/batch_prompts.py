@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from chat_context import estimate_tokens
+from llm_gateway import BACKEND_TYPES, Gateway, GatewayError, LLMRequest, load_gateway
+
+class RateLimiter:
+    # Token bucket refilled continuously at per_minute / 60 per second, holding at most one minute of budget
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # Requests larger than the whole bucket wait for a full one instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return
+            await asyncio.sleep((amount - self.available) / self.rate)
+
+    def adjust(self, amount):
+        # Settle the difference once the real cost is known, the balance may go negative
+        self.available -= amount
+
+def completed_ids(path):
+    # The IDs seen so far are the one thing that grows with the input, everything else is bounded
+    done = set()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by an interrupted run
+                if record.get('error') is None:
+                    done.add(record['id'])
+    except FileNotFoundError:
+        pass
+    return done
+
+def parse_prompt(line, number):
+    # Returns (item, error), a line that cannot be used comes back as its line number and the reason
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as bad:
+        return {'id': number}, f"invalid JSON: {bad}"
+    if not isinstance(item, dict):
+        return {'id': number}, "expected a JSON object"
+    item.setdefault('id', number)
+    if not isinstance(item['id'], (str, int, float)) or isinstance(item['id'], bool):
+        return {'id': number}, f"id must be a string or a number, got {item['id']!r}"
+    return item, None
+
+def read_prompts(path, skip):
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                item, error = parse_prompt(line, number)
+                if item['id'] not in skip:
+                    yield item, error
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+class BatchRunner:
+    def __init__(self, gateway, concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_output_tokens=256):
+        self.gateway = gateway
+        self.concurrency = concurrency
+        self.requests = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self.tokens = RateLimiter(tokens_per_minute) if tokens_per_minute else None
+        self.max_output_tokens = max_output_tokens
+        self.counts = {'ok': 0, 'failed': 0, 'tokens': 0}
+
+    def _write(self, out, record):
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+    async def _run_one(self, item, error, out, slots):
+        try:
+            if error is None:
+                try:
+                    request = LLMRequest(item.get('messages') or item['prompt'], model=item.get('model'),
+                                         params=item.get('params'))
+                    # Reserve the estimate up front and settle with the reported usage afterwards
+                    estimate = sum(estimate_tokens(m['content']) for m in request.messages) + self.max_output_tokens
+                except (KeyError, TypeError, ValueError) as bad:
+                    error = f"invalid prompt: {bad!r}"
+            if error is not None:
+                self.counts['failed'] += 1
+                self._write(out, {'id': item['id'], 'content': None, 'error': error})
+                return
+            if self.requests:
+                await self.requests.acquire()
+            if self.tokens:
+                await self.tokens.acquire(estimate)
+            record = {'id': item['id']}
+            try:
+                response = await self.gateway.acomplete(request)
+            except Exception as failure:
+                record.update(content=None, error=str(failure) if isinstance(failure, GatewayError) else repr(failure))
+                self.counts['failed'] += 1
+            else:
+                used = (response.prompt_tokens or 0) + (response.completion_tokens or 0)
+                if self.tokens and used:
+                    self.tokens.adjust(used - estimate)
+                record.update(response.to_dict(), error=None)
+                self.counts['ok'] += 1
+                self.counts['tokens'] += used
+            self._write(out, record)
+        finally:
+            slots.release()
+
+    async def run(self, prompts, out):
+        # A slot is taken before the next line is read, so at most `concurrency` prompts are held at once
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        for item, error in prompts:
+            await slots.acquire()
+            # Reap finished tasks, retrieving their results so no exception goes unseen
+            for task in [task for task in running if task.done()]:
+                running.discard(task)
+                task.result()
+            running.add(asyncio.ensure_future(self._run_one(item, error, out, slots)))
+        if running:
+            await asyncio.gather(*running)
+        return self.counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run prompts from a JSONL file through an LLM backend")
+    parser.add_argument('input', help="JSONL with {'id', 'prompt' or 'messages', 'model'?, 'params'?} per line, - for stdin")
+    parser.add_argument('output', help="results JSONL, appended to; IDs already answered there are skipped")
+    parser.add_argument('--backend', choices=sorted(BACKEND_TYPES), help="single backend instead of the gateway config")
+    parser.add_argument('--model', help="model for --backend")
+    parser.add_argument('--host', help="Ollama server for --backend ollama")
+    parser.add_argument('--config', help="gateway config JSON, defaults to LLM_GATEWAY_CONFIG")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rpm', type=float, help="max requests per minute")
+    parser.add_argument('--tpm', type=float, help="max tokens per minute")
+    parser.add_argument('--max-output-tokens', type=int, default=256, help="reply size assumed for --tpm")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        options = {'model': args.model} if args.model else {}
+        if args.backend == 'ollama':
+            options['host'] = args.host
+        gateway = Gateway([BACKEND_TYPES[args.backend](**options)], timeout=args.timeout,
+                          max_workers=args.concurrency)
+    else:
+        gateway = load_gateway(args.config, timeout=args.timeout, max_workers=args.concurrency)
+    runner = BatchRunner(gateway, args.concurrency, args.rpm, args.tpm, args.max_output_tokens)
+    prompts = read_prompts(args.input, completed_ids(args.output))
+    start = time.perf_counter()
+    try:
+        with open(args.output, 'a') as out:
+            counts = asyncio.run(runner.run(prompts, out))
+    finally:
+        gateway.close()
+    elapsed = time.perf_counter() - start
+    print(json.dumps(dict(counts, elapsed=elapsed, backends=gateway.stats())), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
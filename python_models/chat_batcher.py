@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+import httpx
+import ollama
+
+class BatchStats:
+    def __init__(self, max_batch):
+        self.max_batch = max_batch
+        self.requests = 0
+        self.batches = 0
+        self.batched = 0
+        self.full_batches = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.depth_total = 0
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.batched / self.batches if self.batches else 0.0,
+            'fill_ratio': self.batched / (self.batches * self.max_batch) if self.batches else 0.0,
+            'full_batches': self.full_batches,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'mean_queue_depth': self.depth_total / self.requests if self.requests else 0.0,
+        }
+
+class MicroBatcher:
+    # Collects concurrent chat calls per (model, options, chat args) for up to max_wait seconds or max_batch requests,
+    # then sends the batch at once over one keep-alive connection pool so the server's parallel slots fill up
+    def __init__(self, host=None, max_batch=8, max_wait=0.005, keep_alive=None, client=None):
+        self.host = host
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.keep_alive = keep_alive
+        self.client = client
+        self.pending = {}
+        self.timers = {}
+        self.dispatching = set()
+        self.stats = BatchStats(max_batch)
+
+    def _client(self):
+        # Created on first use so it binds to the running event loop
+        if self.client is None:
+            self.client = ollama.AsyncClient(host=self.host, limits=httpx.Limits(
+                max_connections=self.max_batch, max_keepalive_connections=self.max_batch))
+        return self.client
+
+    async def chat(self, model, messages, options=None, **kwargs):
+        # Extra chat arguments (keep_alive, format, ...) are part of the batch key, so only identical calls share
+        # a batch. The key is only for grouping, the batch keeps the caller's own objects to send
+        kwargs.setdefault('keep_alive', self.keep_alive)
+        key = (model, json.dumps([options, kwargs], sort_keys=True, default=repr))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _, _, batch = self.pending.setdefault(key, (options, kwargs, []))
+        batch.append((messages, future))
+        self.stats.requests += 1
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        self.stats.depth_total += self.stats.queue_depth
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if key not in self.pending:
+            return
+        options, kwargs, batch = self.pending.pop(key)
+        self.stats.queue_depth -= len(batch)
+        self.stats.batches += 1
+        self.stats.batched += len(batch)
+        self.stats.full_batches += len(batch) == self.max_batch
+        task = asyncio.ensure_future(self._dispatch(key[0], options, kwargs, batch))
+        # The loop only keeps weak references to tasks
+        self.dispatching.add(task)
+        task.add_done_callback(self.dispatching.discard)
+
+    async def _dispatch(self, model, options, kwargs, batch):
+        client = self._client()
+        results = await asyncio.gather(
+            *(client.chat(model=model, messages=messages, options=options, **kwargs) for messages, _ in batch),
+            return_exceptions=True)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+class BatchingClient:
+    # Drop-in for ollama.Client.chat from any number of threads: calls go through a MicroBatcher running
+    # on a background event loop, streaming calls bypass the batcher
+    def __init__(self, host=None, **batcher_args):
+        self.batcher = MicroBatcher(host=host, **batcher_args)
+        self.stream_client = ollama.Client(host=host)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def stats(self):
+        return self.batcher.stats
+
+    def chat(self, model, messages, options=None, stream=False, **kwargs):
+        if stream:
+            return self.stream_client.chat(model=model, messages=messages, options=options, stream=True, **kwargs)
+        future = asyncio.run_coroutine_threadsafe(self.batcher.chat(model, messages, options, **kwargs), self.loop)
+        return future.result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,91 @@
+from collections import deque
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+WORDS_PER_TOKEN = 0.75
+
+def estimate_tokens(text):
+    # Rough count for budgeting, about four characters per token plus the chat template overhead
+    return MESSAGE_OVERHEAD + (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class Conversation:
+    # Chat history held under a token budget. The system prompt always leads the payload unchanged, and
+    # once the budget is exceeded the oldest turns are dropped down to low_water * budget in one go,
+    # so the prefix the server has cached only changes every few turns instead of on every one
+    def __init__(self, system=None, budget=None, low_water=0.75, summarizer=None):
+        self.system = [{'role': 'system', 'content': system}] if system else []
+        self.system_tokens = sum(estimate_tokens(m['content']) for m in self.system)
+        self.budget = budget
+        self.low_water = low_water
+        self.summarizer = summarizer
+        self.summary = None
+        self.summary_tokens = 0
+        self.turns = deque()
+        self.turn_tokens = 0
+        self.trimmed = 0
+
+    @property
+    def messages(self):
+        summary = [{'role': 'system', 'content': SUMMARY_PREFIX + self.summary}] if self.summary else []
+        return self.system + summary + [message for message, _ in self.turns]
+
+    @property
+    def tokens(self):
+        return self.system_tokens + self.summary_tokens + self.turn_tokens
+
+    def append(self, role, content):
+        tokens = estimate_tokens(content)
+        self.turns.append(({'role': role, 'content': content}, tokens))
+        self.turn_tokens += tokens
+        if self.budget is not None and self.tokens > self.budget:
+            self.trim()
+
+    def trim(self):
+        target = self.budget * self.low_water
+        dropped = []
+        # The newest message always stays, and the window restarts at a user turn
+        while len(self.turns) > 1 and (self.tokens > target or self.turns[0][0]['role'] != 'user'):
+            message, tokens = self.turns.popleft()
+            self.turn_tokens -= tokens
+            dropped.append(message)
+        if not dropped:
+            return
+        self.trimmed += len(dropped)
+        if self.summarizer is not None:
+            self.summary = truncate_words(self.summarizer(self.summary, dropped), self.summary_budget())
+            self.summary_tokens = estimate_tokens(SUMMARY_PREFIX + self.summary) if self.summary else 0
+
+    def summary_budget(self):
+        # A runaway summary would eat the budget it is meant to save, it gets at most a quarter of it
+        return (self.budget // 4) * CHARS_PER_TOKEN
+
+    def reset(self):
+        self.summary = None
+        self.summary_tokens = 0
+        self.turns.clear()
+        self.turn_tokens = 0
+
+def truncate_words(text, limit):
+    # Keeps the start, which holds the oldest facts, and cuts at a word boundary
+    if len(text) <= limit:
+        return text
+    # One character past the limit shows whether the cut lands on a word boundary
+    words = text[:limit + 1].rsplit(None, 1)
+    return (words[0] if len(words) > 1 else text[:limit]).rstrip()
+
+def summary_words(budget):
+    # Length to ask the summarizer for, so truncate_words() rarely has to cut
+    return max(1, int((budget // 4) * WORDS_PER_TOKEN))
+
+def model_summarizer(client, model, options=None, max_words=120):
+    # Summarizer that asks the chat model itself to fold dropped turns into the running summary
+    def summarize(summary, messages):
+        transcript = '\n'.join(f"{m['role']}: {m['content']}" for m in messages)
+        if summary:
+            transcript = f"Earlier summary: {summary}\n{transcript}"
+        prompt = (f"Summarize this conversation in at most {max_words} words, keeping names, facts and "
+                  f"decisions the assistant may need later.\n\n{transcript}")
+        response = client.chat(model=model, messages=[{'role': 'user', 'content': prompt}], options=options)
+        return response['message']['content'].strip()
+    return summarize
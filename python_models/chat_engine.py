@@ -0,0 +1,113 @@
+import asyncio
+import random
+import time
+import httpx
+import ollama
+from chatbot import DEFAULT_MODEL
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def as_messages(prompt):
+    return [{'role': 'user', 'content': prompt}] if isinstance(prompt, str) else list(prompt)
+
+def echo_reply(messages):
+    # Default reply of the stand-in backends (FakeOllamaServer, FakeBackend)
+    return f"You said: {messages[-1]['content']}" if messages else "Hello!"
+
+class EngineStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.tokens = 0
+        self.latencies = []
+        self.started = None
+        self.finished = None
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'retries': self.retries,
+            'elapsed': elapsed,
+            'requests_per_sec': self.requests / elapsed if elapsed > 0 else 0.0,
+            'tokens_per_sec': self.tokens / elapsed if elapsed > 0 else 0.0,
+            'latency_p50': percentile(self.latencies, 50),
+            'latency_p95': percentile(self.latencies, 95),
+        }
+
+class ChatEngine:
+    # Pushes many prompts through one shared AsyncClient with bounded concurrency, timeouts and retries
+    def __init__(self, model=DEFAULT_MODEL, host=None, concurrency=8, timeout=120.0, retries=3, backoff=0.5,
+                 options=None, client=None):
+        self.model = model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.options = options
+        self.client = client or ollama.AsyncClient(
+            host=host, limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency))
+        self.stats = EngineStats()
+        self.semaphore = None
+
+    def _retryable(self, error):
+        if isinstance(error, ollama.ResponseError):
+            return error.status_code in RETRYABLE_STATUS
+        return isinstance(error, (asyncio.TimeoutError, httpx.TransportError, ConnectionError))
+
+    async def chat(self, prompt):
+        # One request, returns a result dict and never raises
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        messages = as_messages(prompt)
+        async with self.semaphore:
+            start = time.perf_counter()
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.chat(model=self.model, messages=messages, options=self.options),
+                        self.timeout)
+                except Exception as error:
+                    if attempt == self.retries or not self._retryable(error):
+                        self.stats.failures += 1
+                        return {'content': None, 'error': repr(error), 'attempts': attempt + 1,
+                                'latency': time.perf_counter() - start}
+                    self.stats.retries += 1
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+                    continue
+                latency = time.perf_counter() - start
+                self.stats.requests += 1
+                self.stats.tokens += response.get('eval_count') or 0
+                self.stats.latencies.append(latency)
+                return {
+                    'content': response['message']['content'],
+                    'error': None,
+                    'attempts': attempt + 1,
+                    'latency': latency,
+                    'prompt_eval_count': response.get('prompt_eval_count'),
+                    'eval_count': response.get('eval_count'),
+                }
+
+    async def run(self, prompts):
+        # Results come back in the same order as the prompts
+        self.stats = EngineStats()
+        self.stats.started = time.perf_counter()
+        results = await asyncio.gather(*(self.chat(prompt) for prompt in prompts))
+        self.stats.finished = time.perf_counter()
+        return results
+
+def run_prompts(prompts, **engine_args):
+    # Synchronous helper: returns (results, stats summary)
+    async def go():
+        engine = ChatEngine(**engine_args)
+        results = await engine.run(prompts)
+        return results, engine.stats.summary()
+    return asyncio.run(go())
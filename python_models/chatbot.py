@@ -1,7 +1,121 @@
+import argparse
 import ollama
+from chat_context import Conversation, model_summarizer, summary_words
+from llm_cache import ResponseCache, cache_key, replay_stream
 
-# Run a prompt using Llama 3
-response = ollama.chat(model='llama3.2:1b', messages=[{'role': 'user', 'content': 'hello'}])
+DEFAULT_MODEL = 'llama3.2:1b'
 
-# Print the response
-print(response['message']['content'])
+class ChatSession:
+    # Multi-turn chat over one long-lived client, so the HTTP connection is reused between turns.
+    # With max_tokens the history is trimmed (or summarized) to a budget behind a fixed system prompt,
+    # and keep_alive keeps the model and its prompt cache loaded between turns
+    def __init__(self, model=DEFAULT_MODEL, host=None, client=None, system=None, options=None, cache=None,
+                 max_tokens=None, summarize=False, keep_alive=None, semantic_cache=None):
+        self.model = model
+        self.client = client or ollama.Client(host=host)
+        self.options = options
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.keep_alive = keep_alive
+        summarizer = None
+        if summarize and max_tokens:
+            summarizer = model_summarizer(self.client, model, options, max_words=summary_words(max_tokens))
+        self.conversation = Conversation(system, budget=max_tokens, summarizer=summarizer)
+
+    @property
+    def messages(self):
+        return self.conversation.messages
+
+    def reset(self):
+        self.conversation.reset()
+
+    def _lookup(self, messages):
+        # Exact match first, then a reworded prompt close enough in the semantic cache
+        key = cache_key('ollama', self.model, messages, self.options) if self.cache is not None else None
+        reply = self.cache.get(key) if key else None
+        if reply is None and self.semantic_cache is not None:
+            reply = self.semantic_cache.get('ollama', self.model, messages, self.options)
+        return key, reply
+
+    def _store(self, key, messages, reply):
+        if key:
+            self.cache.put(key, reply)
+        if self.semantic_cache is not None:
+            self.semantic_cache.put('ollama', self.model, messages, reply, self.options)
+
+    def _chat(self, messages, stream=False):
+        extra = {'keep_alive': self.keep_alive} if self.keep_alive is not None else {}
+        return self.client.chat(model=self.model, messages=messages, options=self.options, stream=stream, **extra)
+
+    def send(self, content):
+        self.conversation.append('user', content)
+        messages = self.messages
+        key, reply = self._lookup(messages)
+        if reply is None:
+            reply = self._chat(messages)['message']['content']
+            self._store(key, messages, reply)
+        self.conversation.append('assistant', reply)
+        return reply
+
+    def stream(self, content):
+        # Yields reply tokens as they arrive, whatever was received is kept in the history
+        self.conversation.append('user', content)
+        messages = self.messages
+        key, cached = self._lookup(messages)
+        parts = []
+        complete = False
+        try:
+            if cached is not None:
+                chunks = replay_stream(cached)
+            else:
+                chunks = (chunk['message']['content'] for chunk in self._chat(messages, stream=True))
+            for token in chunks:
+                if token:
+                    parts.append(token)
+                    yield token
+            complete = True
+        finally:
+            reply = ''.join(parts)
+            # Only complete replies are cached
+            if complete and cached is None:
+                self._store(key, messages, reply)
+            self.conversation.append('assistant', reply)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat with a local Ollama model")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--host', help="Ollama server, defaults to OLLAMA_HOST or localhost:11434")
+    parser.add_argument('--system', help="system prompt")
+    parser.add_argument('--no-cache', action='store_true', help="always ask the model")
+    parser.add_argument('--max-tokens', type=int, help="approximate token budget for the sent history")
+    parser.add_argument('--summarize', action='store_true', help="summarize trimmed turns instead of dropping them")
+    parser.add_argument('--keep-alive', default='30m', help="how long the server keeps the model loaded")
+    parser.add_argument('--semantic-model', help="Ollama embedding model, enables answering reworded prompts from cache")
+    parser.add_argument('--similarity', type=float, default=0.92, help="cosine similarity needed for a semantic hit")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ResponseCache()
+    semantic_cache = None
+    if args.semantic_model and not args.no_cache:
+        from llm_semantic_cache import SemanticCache, ollama_embedder
+        semantic_cache = SemanticCache(ollama_embedder(args.semantic_model, host=args.host), threshold=args.similarity)
+    session = ChatSession(model=args.model, host=args.host, system=args.system, cache=cache,
+                          max_tokens=args.max_tokens, summarize=args.summarize, keep_alive=args.keep_alive,
+                          semantic_cache=semantic_cache)
+    print("Type a message, 'q' to quit, '/reset' to start over")
+    while True:
+        try:
+            prompt = input('> ')
+        except EOFError:
+            break
+        if prompt.lower() == 'q':
+            break
+        if prompt == '/reset':
+            session.reset()
+            continue
+        for token in session.stream(prompt):
+            print(token, end='', flush=True)
+        print()
+
+if __name__ == '__main__':
+    main()
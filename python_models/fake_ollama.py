@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from chat_engine import echo_reply
+
+# Local stand-in for the Ollama chat API, for running the chat code without a model:
+#     with FakeOllamaServer() as server:
+#         ChatSession(host=server.url).send('hello')
+
+def hashed_embedding(text, dim=64):
+    # Bag of character trigrams hashed into dim buckets, so reworded texts land close together
+    vector = [0.0] * dim
+    words = ' '.join(text.lower().split())
+    for i in range(len(words) - 2):
+        vector[zlib.crc32(words[i:i + 3].encode()) % dim] += 1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+class FakeOllamaServer:
+    def __init__(self, reply=echo_reply, token_delay=0.0, host='127.0.0.1', port=0, failures=0):
+        self.reply = reply
+        self.token_delay = token_delay
+        # The next `failures` requests get a 503, to exercise client retries
+        self.failures = failures
+        self.lock = threading.Lock()
+        self.requests = []
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                server.requests.append((self.path, body))
+                with server.lock:
+                    fail = server.failures > 0
+                    server.failures -= fail
+                if fail:
+                    self.send_json(503, {'error': 'server busy'})
+                elif self.path == '/api/chat':
+                    self.chat(body)
+                elif self.path == '/api/embed':
+                    texts = body.get('input') or ''
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self.send_json(200, {'model': body.get('model', ''),
+                                         'embeddings': [hashed_embedding(text) for text in texts]})
+                else:
+                    self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+
+            def send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def chat(self, body):
+                messages = body.get('messages') or []
+                text = server.reply(messages)
+                # Whitespace-preserving "tokens", so joining them gives back the reply
+                tokens = [word + ' ' for word in text.split(' ')]
+                tokens[-1] = tokens[-1][:-1]
+                base = {'model': body.get('model', ''), 'created_at': datetime.now(timezone.utc).isoformat()}
+                final = dict(base, done=True, done_reason='stop', total_duration=0,
+                             prompt_eval_count=sum(len(m.get('content', '').split()) for m in messages),
+                             eval_count=len(tokens))
+                if not body.get('stream', True):
+                    time.sleep(server.token_delay * len(tokens))
+                    self.send_json(200, dict(final, message={'role': 'assistant', 'content': text}))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(server.token_delay)
+                    if not self.write_chunk(dict(base, message={'role': 'assistant', 'content': token}, done=False)):
+                        return
+                if self.write_chunk(dict(final, message={'role': 'assistant', 'content': ''})):
+                    self.write_raw(b'0\r\n\r\n')
+
+            def write_chunk(self, payload):
+                data = json.dumps(payload).encode() + b'\n'
+                return self.write_raw(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+
+            def write_raw(self, data):
+                # A client that stops reading a stream early closes the socket under us
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                    return True
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                    return False
+
+        return Handler
+
+if __name__ == '__main__':
+    with FakeOllamaServer(token_delay=0.05) as server:
+        print(f"Fake Ollama listening on {server.url}, Ctrl+C to stop")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
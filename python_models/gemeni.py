@@ -1,10 +1,31 @@
+import os
 from google import genai
+from llm_cache import cache_key
 
-client = genai.Client(api_key="")
+DEFAULT_MODEL = "gemini-2.0-flash"
 
-response = client.models.generate_content(
-    model="gemini-2.0-flash",
-    contents="Explain how AI works",
-)
+_client = None
 
-print(response.text)
\ No newline at end of file
+def get_client():
+    # Created on first use, so importing this module never touches the network or the API key
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", ""))
+    return _client
+
+def generate(contents, model=DEFAULT_MODEL, cache=None, client=None):
+    key = cache_key('gemini', model, contents) if cache is not None else None
+    text = cache.get(key) if key else None
+    if text is None:
+        response = (client or get_client()).models.generate_content(
+            model=model,
+            contents=contents,
+        )
+        text = response.text
+        if key and text is not None:
+            cache.put(key, text)
+    return text
+
+if __name__ == "__main__":
+    from llm_cache import ResponseCache
+    print(generate("Explain how AI works", cache=ResponseCache()))
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.llm_cache', 'responses.sqlite')
+
+def normalize_messages(messages):
+    if isinstance(messages, str):
+        messages = [{'role': 'user', 'content': messages}]
+    return [{'role': m['role'].lower(), 'content': ' '.join(m['content'].split())} for m in messages]
+
+def cache_key(provider, model, messages, params=None):
+    payload = {
+        'provider': provider,
+        'model': model,
+        'messages': normalize_messages(messages),
+        'params': params or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def replay_stream(text):
+    # Re-emits a cached reply word by word, joining the chunks gives back the text
+    start = 0
+    for i, char in enumerate(text):
+        if char == ' ' and i > start:
+            yield text[start:i]
+            start = i
+    if start < len(text):
+        yield text[start:]
+
+class ResponseCache:
+    # In-memory LRU in front of an SQLite store, both with a TTL, the store is also capped in bytes
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_items=256, ttl=7 * 24 * 3600, max_disk_bytes=100 * 2 ** 20):
+        self.memory = OrderedDict()
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS responses '
+                            '(key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL, size INTEGER)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+            self.db.commit()
+            self.disk_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self.memory[key]
+            if self.db is not None:
+                row = self.db.execute('SELECT value, created, size FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    value, created, size = row
+                    if not self._expired(created, now):
+                        self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+                        self.db.commit()
+                        self._remember(key, value, created)
+                        self.disk_hits += 1
+                        return value
+                    self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self.db.commit()
+                    self.disk_bytes -= size
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        # None is what get() returns on a miss, so there is nothing to store (e.g. a blocked Gemini reply)
+        if value is None:
+            return
+        now = time.time()
+        with self.lock:
+            self._remember(key, value, now)
+            if self.db is None:
+                return
+            size = len(value.encode())
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', (key, value, now, now, size))
+            self.disk_bytes += size - (old[0] if old else 0)
+            self._evict_disk(now)
+            self.db.commit()
+
+    def _remember(self, key, value, created):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        if self.ttl is not None:
+            expired = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?',
+                                      (now - self.ttl,)).fetchone()[0]
+            if expired:
+                self.db.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+                self.disk_bytes -= expired
+        while self.disk_bytes > self.max_disk_bytes:
+            rows = self.db.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 64').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.memory.pop(key, None)
+                self.disk_bytes -= size
+                if self.disk_bytes <= self.max_disk_bytes:
+                    break
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute('DELETE FROM responses')
+                self.db.commit()
+                self.disk_bytes = 0
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_items': len(self.memory),
+            'disk_bytes': self.disk_bytes if self.db is not None else 0,
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,312 @@
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from chatbot import DEFAULT_MODEL as OLLAMA_MODEL
+from chat_engine import as_messages, echo_reply
+from llm_cache import cache_key
+
+GEMINI_MODEL = "gemini-2.0-flash"
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+# Parameters every backend understands. Anything provider-specific goes under the provider's name,
+# e.g. {'temperature': 0.2, 'ollama': {'num_ctx': 8192}}, and is only sent to that provider
+COMMON_PARAMS = ('temperature', 'max_tokens', 'top_p', 'stop')
+PROVIDERS = ('ollama', 'gemini', 'fake')
+
+class GatewayError(Exception):
+    pass
+
+class LLMRequest:
+    def __init__(self, messages, model=None, params=None, timeout=None):
+        self.messages = as_messages(messages)
+        self.model = model
+        self.params = dict(params or {})
+        unknown = set(self.params) - set(COMMON_PARAMS) - set(PROVIDERS)
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)}, put provider-specific ones under the provider name")
+        if isinstance(self.params.get('stop'), str):
+            self.params['stop'] = [self.params['stop']]
+        self.timeout = timeout
+
+    def backend_params(self, provider, names):
+        # The common parameters under the backend's own names, then that provider's extras
+        params = {names[key]: value for key, value in self.params.items() if key in names}
+        params.update(self.params.get(provider) or {})
+        return params
+
+class LLMResponse:
+    def __init__(self, content, backend, model, latency, prompt_tokens=None, completion_tokens=None, cached=False):
+        self.content = content
+        self.backend = backend
+        self.model = model
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached = cached
+
+    def to_dict(self):
+        return dict(vars(self))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def pooled_client(key, factory):
+    # One client per (provider, endpoint) for the whole process, created on first use
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+class OllamaBackend:
+    provider = 'ollama'
+    param_names = {'temperature': 'temperature', 'max_tokens': 'num_predict', 'top_p': 'top_p', 'stop': 'stop'}
+
+    def __init__(self, name='ollama', model=OLLAMA_MODEL, host=None):
+        self.name = name
+        self.model = model
+        self.host = host
+
+    def client(self, timeout=None):
+        # The HTTP timeout is what actually ends a hung call and frees its worker thread
+        def create():
+            import ollama
+            return ollama.Client(host=self.host, timeout=timeout)
+        return pooled_client(('ollama', self.host, timeout), create)
+
+    def complete(self, request, timeout=None):
+        model = request.model or self.model
+        options = request.backend_params(self.provider, self.param_names)
+        response = self.client(timeout).chat(model=model, messages=request.messages, options=options or None)
+        return LLMResponse(response['message']['content'], self.name, model, 0.0,
+                           response.get('prompt_eval_count'), response.get('eval_count'))
+
+class GeminiBackend:
+    provider = 'gemini'
+    param_names = {'temperature': 'temperature', 'max_tokens': 'max_output_tokens', 'top_p': 'top_p',
+                   'stop': 'stop_sequences'}
+
+    def __init__(self, name='gemini', model=GEMINI_MODEL, api_key=None):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+
+    def client(self, timeout=None):
+        api_key = self.api_key or os.environ.get("GEMINI_API_KEY", "")
+        def create():
+            from google import genai
+            # genai takes its HTTP timeout in milliseconds
+            http_options = {'timeout': int(timeout * 1000)} if timeout else None
+            return genai.Client(api_key=api_key, http_options=http_options)
+        return pooled_client(('gemini', api_key, timeout), create)
+
+    def complete(self, request, timeout=None):
+        model = request.model or self.model
+        system = [m['content'] for m in request.messages if m['role'] == 'system']
+        contents = [{'role': 'model' if m['role'] == 'assistant' else 'user', 'parts': [{'text': m['content']}]}
+                    for m in request.messages if m['role'] != 'system']
+        config = request.backend_params(self.provider, self.param_names)
+        if system:
+            config['system_instruction'] = '\n'.join(system)
+        response = self.client(timeout).models.generate_content(model=model, contents=contents, config=config or None)
+        usage = getattr(response, 'usage_metadata', None)
+        return LLMResponse(response.text, self.name, model, 0.0,
+                           getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+
+class FakeBackend:
+    # In-process backend for tests and dry runs
+    provider = 'fake'
+
+    def __init__(self, name='fake', model='fake', reply=echo_reply, latency=0.0, failures=0):
+        self.name = name
+        self.model = model
+        self.reply = reply
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+
+    def complete(self, request, timeout=None):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError(f"{self.name} is unavailable")
+        if timeout is not None and self.latency > timeout:
+            # Behaves like an HTTP client timeout, the call ends instead of holding its thread
+            time.sleep(timeout)
+            raise TimeoutError(f"{self.name} timed out")
+        time.sleep(self.latency)
+        text = self.reply(request.messages)
+        return LLMResponse(text, self.name, request.model or self.model, 0.0,
+                           sum(len(m['content'].split()) for m in request.messages), len(text.split()))
+
+BACKEND_TYPES = {'ollama': OllamaBackend, 'gemini': GeminiBackend, 'fake': FakeBackend}
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th percentile
+        if not self.count:
+            return None
+        target = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'buckets': {f"le_{bound}": count for bound, count in zip(self.buckets + ['inf'], self.counts)},
+        }
+
+class BackendState:
+    def __init__(self, backend):
+        self.backend = backend
+        self.histogram = LatencyHistogram()
+        self.ewma = None
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def healthy(self, now):
+        return now >= self.unhealthy_until
+
+class Gateway:
+    # Routes each request to the fastest healthy backend ('fastest') or in configured order ('ordered'),
+    # falling back to the next one on errors and timeouts
+    def __init__(self, backends, policy='fastest', timeout=60.0, failure_threshold=3, cooldown=30.0,
+                 cache=None, semantic_cache=None, max_workers=32):
+        if policy not in ('fastest', 'ordered'):
+            raise ValueError(f"Unknown routing policy: {policy}")
+        self.states = [BackendState(backend) for backend in backends]
+        self.policy = policy
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # acomplete() runs the blocking complete() here, not on the backend pool it waits on, and not on
+        # asyncio's default executor, which is capped at cpu_count + 4 threads
+        self.callers = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        # config: {"policy": ..., "backends": [{"type": "ollama", "model": ..., "host": ...}, ...]}
+        backends = []
+        for spec in config['backends']:
+            spec = dict(spec)
+            backends.append(BACKEND_TYPES[spec.pop('type')](**spec))
+        options = {k: v for k, v in config.items() if k != 'backends'}
+        options.update(overrides)
+        return cls(backends, **options)
+
+    def candidates(self):
+        now = time.monotonic()
+        with self.lock:
+            states = list(self.states)
+            if self.policy == 'fastest':
+                # Backends without measurements sort first so they get tried
+                states.sort(key=lambda s: s.ewma or 0.0)
+            healthy = [s for s in states if s.healthy(now)]
+            return healthy + [s for s in states if not s.healthy(now)]
+
+    def _record(self, state, latency=None):
+        with self.lock:
+            if latency is None:
+                state.failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.failure_threshold:
+                    state.unhealthy_until = time.monotonic() + self.cooldown
+                return
+            state.histogram.record(latency)
+            state.ewma = latency if state.ewma is None else 0.8 * state.ewma + 0.2 * latency
+            state.consecutive_failures = 0
+            state.unhealthy_until = 0.0
+
+    def complete(self, request):
+        if not isinstance(request, LLMRequest):
+            request = LLMRequest(request)
+        errors = []
+        for state in self.candidates():
+            backend = state.backend
+            model = request.model or backend.model
+            key = None
+            cached = None
+            if self.cache is not None:
+                key = cache_key(backend.provider, model, request.messages, request.params)
+                cached = self.cache.get(key)
+            if cached is None and self.semantic_cache is not None:
+                cached = self.semantic_cache.get(backend.provider, model, request.messages, request.params)
+            if cached is not None:
+                return LLMResponse(cached, backend.name, model, 0.0, cached=True)
+            timeout = request.timeout or self.timeout
+            start = time.perf_counter()
+            future = self.executor.submit(backend.complete, request, timeout)
+            try:
+                response = future.result(timeout=timeout)
+            except FutureTimeout:
+                future.cancel()
+                self._record(state)
+                errors.append(f"{backend.name}: timed out")
+                continue
+            except Exception as error:
+                self._record(state)
+                errors.append(f"{backend.name}: {error!r}")
+                continue
+            response.latency = time.perf_counter() - start
+            self._record(state, response.latency)
+            if response.content is None:
+                return response
+            if key:
+                self.cache.put(key, response.content)
+            if self.semantic_cache is not None:
+                self.semantic_cache.put(backend.provider, model, request.messages, response.content, request.params)
+            return response
+        raise GatewayError("All backends failed: " + '; '.join(errors))
+
+    async def acomplete(self, request):
+        return await asyncio.get_running_loop().run_in_executor(self.callers, self.complete, request)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                s.backend.name: {
+                    'healthy': s.healthy(now),
+                    'failures': s.failures,
+                    'ewma_latency': s.ewma,
+                    'latency': s.histogram.to_dict(),
+                }
+                for s in self.states
+            }
+
+    def close(self):
+        self.callers.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def load_gateway(path=None, **overrides):
+    # Backends come from a JSON file (path or LLM_GATEWAY_CONFIG), so routing changes need no code changes
+    path = path or os.environ.get('LLM_GATEWAY_CONFIG')
+    if path:
+        with open(path) as f:
+            return Gateway.from_config(json.load(f), **overrides)
+    return Gateway([OllamaBackend()], **overrides)
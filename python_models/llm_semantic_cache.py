@@ -0,0 +1,168 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+import ollama
+from llm_cache import normalize_messages
+
+DEFAULT_EMBED_MODEL = 'nomic-embed-text'
+
+def ollama_embedder(model=DEFAULT_EMBED_MODEL, host=None, client=None):
+    # Embeds a list of texts with the local Ollama /api/embed endpoint
+    client = client or ollama.Client(host=host)
+
+    def embed(texts):
+        return np.asarray(client.embed(model=model, input=list(texts))['embeddings'], dtype=np.float32)
+    return embed
+
+def namespace(provider, model, messages, params=None):
+    # Only the last message is compared by meaning. Everything before it (system prompt, earlier
+    # turns), the model and its settings must match exactly, or a follow-up like "another one"
+    # would be answered from a different conversation
+    payload = json.dumps([provider, model, params or {}, normalize_messages(messages)[:-1]],
+                         sort_keys=True, default=str)
+    return int.from_bytes(hashlib.sha256(payload.encode()).digest()[:8], 'little', signed=True)
+
+class SemanticCache:
+    # Answers prompts that mean the same as one seen before. Unit vectors live in a fixed
+    # capacity x dim float32 matrix, so memory is bounded, and the least recently used row is
+    # overwritten once it is full. Lookups are a brute-force matrix product, or with
+    # partitions=n an IVF index that only scores rows in the `probes` nearest k-means cells
+    def __init__(self, embedder, threshold=0.92, capacity=10000, partitions=None, probes=2, latency_window=1000):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.partitions = partitions
+        self.probes = probes
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.answers = [None] * capacity
+        self.spaces = np.zeros(capacity, dtype=np.int64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.cells = np.zeros(capacity, dtype=np.int32)
+        self.centroids = None
+        self.trained_size = 0
+        self.size = 0
+        self.clock = 0
+        self.embedded = (None, None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def _embed(self, text):
+        # The text missed by get() is usually the one put() stores next, so keep its vector. The memo is read
+        # once into locals, other threads replace it concurrently
+        embedded_text, vector = self.embedded
+        if embedded_text != text:
+            vector = np.asarray(self.embedder([text]), dtype=np.float32).reshape(-1)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+            self.embedded = (text, vector)
+        return vector
+
+    def _try_embed(self, messages):
+        # An unreachable embedder turns the semantic tier into a miss instead of failing the request
+        try:
+            return self._embed(normalize_messages(messages)[-1]['content'])
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            return None
+
+    def _candidates(self, vector):
+        if self.centroids is None:
+            return np.arange(self.size)
+        nearest = np.argsort(self.centroids @ vector)[-self.probes:]
+        return np.flatnonzero(np.isin(self.cells[:self.size], nearest))
+
+    def _train(self, iterations=10):
+        # k-means over the stored vectors, redone each time the cache doubles
+        data = self.vectors[:self.size]
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(self.size, self.partitions, replace=False)].copy()
+        for _ in range(iterations):
+            cells = np.argmax(data @ centroids.T, axis=1)
+            for cell in range(self.partitions):
+                members = data[cells == cell]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    centroids[cell] = mean / (np.linalg.norm(mean) or 1.0)
+        self.centroids = centroids
+        self.cells[:self.size] = np.argmax(data @ centroids.T, axis=1)
+        self.trained_size = self.size
+
+    def get(self, provider, model, messages, params=None):
+        start = time.perf_counter()
+        vector = self._try_embed(messages)
+        with self.lock:
+            answer = None
+            space = namespace(provider, model, messages, params)
+            if self.size and vector is not None:
+                rows = self._candidates(vector)
+                rows = rows[self.spaces[rows] == space]
+                if len(rows):
+                    scores = self.vectors[rows] @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        row = rows[best]
+                        self.clock += 1
+                        self.last_used[row] = self.clock
+                        answer = self.answers[row]
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.latencies.append(time.perf_counter() - start)
+            return answer
+
+    def put(self, provider, model, messages, answer, params=None):
+        vector = self._try_embed(messages)
+        if vector is None:
+            return
+        with self.lock:
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            if self.size < self.capacity:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used))
+                self.evictions += 1
+            space = namespace(provider, model, messages, params)
+            self.vectors[row] = vector
+            self.answers[row] = answer
+            self.spaces[row] = space
+            self.clock += 1
+            self.last_used[row] = self.clock
+            if self.partitions and self.size >= max(2 * self.trained_size, 8 * self.partitions):
+                self._train()
+            elif self.centroids is not None:
+                self.cells[row] = int(np.argmax(self.centroids @ vector))
+
+    def clear(self):
+        with self.lock:
+            self.answers = [None] * self.capacity
+            self.last_used[:] = 0
+            self.centroids = None
+            self.trained_size = 0
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            latencies = sorted(self.latencies)
+            return {
+                'size': self.size,
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'embed_errors': self.errors,
+                'lookup_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+                'lookup_p95': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+                'nbytes': self.vectors.nbytes if self.vectors is not None else 0,
+            }
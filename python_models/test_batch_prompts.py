@@ -0,0 +1,27 @@
+import json
+from batch_prompts import main
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+
+def read_records(path):
+    return {record['id']: record for record in map(json.loads, path.read_text().splitlines())}
+
+def test_runs_prompts_and_records_bad_lines(tmp_path):
+    prompts, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(prompts, ['{"id": "a", "prompt": "one"}', '{"id": "b"}', 'not json', '[1]',
+                          '{"id": ["x"], "prompt": "list id"}', '{"id": "c", "messages": [{"role": "user", "content": "two"}]}'])
+    main([str(prompts), str(output), '--backend', 'fake'])
+    records = read_records(output)
+    assert records['a']['content'] == 'You said: one' and records['c']['content'] == 'You said: two'
+    assert records['b']['error'] and records[3]['error'] and records[4]['error'] and records[5]['error']
+
+def test_resume_skips_answered_ids(tmp_path):
+    prompts, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(prompts, [json.dumps({'id': i, 'prompt': f'p{i}'}) for i in range(10)])
+    write_lines(output, [json.dumps({'id': i, 'content': 'done', 'error': None}) for i in range(6)]
+                + [json.dumps({'id': 6, 'content': None, 'error': 'boom'}), '{"id": 7, "cont'])
+    main([str(prompts), str(output), '--backend', 'fake'])
+    lines = [json.loads(line) for line in output.read_text().splitlines()[8:]]
+    # Failed and cut-off IDs are retried, answered ones are not
+    assert sorted(record['id'] for record in lines) == [6, 7, 8, 9]
@@ -0,0 +1,41 @@
+import asyncio
+import ollama
+import pytest
+from chat_batcher import BatchingClient, MicroBatcher
+from chatbot import ChatSession
+from fake_ollama import FakeOllamaServer
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer() as server:
+        yield server
+
+def test_concurrent_calls_share_batches(server):
+    async def go():
+        batcher = MicroBatcher(host=server.url, max_batch=4, max_wait=0.05)
+        replies = await asyncio.gather(*(batcher.chat('m', [{'role': 'user', 'content': str(i)}]) for i in range(8)))
+        return batcher, replies
+    batcher, replies = asyncio.run(go())
+    assert [r['message']['content'] for r in replies] == [f'You said: {i}' for i in range(8)]
+    summary = batcher.stats.summary()
+    assert summary['batches'] == 2 and summary['fill_ratio'] == 1.0 and summary['queue_depth'] == 0
+
+def test_failures_reach_only_their_caller(server):
+    server.failures = 1
+    async def go():
+        batcher = MicroBatcher(host=server.url, max_wait=0.05)
+        return await asyncio.gather(*(batcher.chat('m', [{'role': 'user', 'content': 'x'}]) for _ in range(2)),
+                                    return_exceptions=True)
+    results = asyncio.run(go())
+    assert sum(isinstance(r, ollama.ResponseError) for r in results) == 1
+
+def test_session_calls_with_keep_alive_are_batched(server):
+    with BatchingClient(host=server.url) as client:
+        session = ChatSession(model='m', client=client, keep_alive='30m')
+        session.send('a')
+        assert ''.join(session.stream('b')) == 'You said: b'
+        assert client.chat('m', [{'role': 'user', 'content': 'c'}],
+                           options=ollama.Options(temperature=0.1))['message']['content'] == 'You said: c'
+        assert client.stats.summary()['requests'] == 2
+    assert server.requests[0][1]['keep_alive'] == '30m'
+    assert server.requests[-1][1]['options'] == {'temperature': 0.1}
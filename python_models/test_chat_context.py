@@ -0,0 +1,40 @@
+from chat_context import Conversation, estimate_tokens, truncate_words
+
+def test_history_stays_under_budget():
+    conversation = Conversation('Be terse.', budget=300)
+    for i in range(50):
+        conversation.append('user', f'question {i} ' * 5)
+        conversation.append('assistant', f'answer {i} ' * 5)
+        assert conversation.tokens <= 300
+    messages = conversation.messages
+    assert messages[0] == {'role': 'system', 'content': 'Be terse.'}
+    assert messages[1]['role'] == 'user'
+    assert messages[-1]['content'] == 'answer 49 ' * 5
+    assert conversation.tokens == sum(estimate_tokens(m['content']) for m in messages)
+
+def test_trimming_goes_down_to_low_water():
+    conversation = Conversation(budget=1000, low_water=0.5)
+    trims = []
+    for i in range(60):
+        conversation.append('user', 'x' * 100)
+        trims.append(conversation.trimmed)
+    # Each trim frees half the budget, so the prefix only changes every dozen or so turns
+    assert len(set(trims)) <= 6
+
+def test_summary_keeps_its_start_within_budget():
+    summaries = []
+    def summarizer(summary, dropped):
+        summaries.append(len(dropped))
+        return ' '.join(f'fact{i}' for i in range(500))
+    conversation = Conversation(budget=200, summarizer=summarizer)
+    for i in range(20):
+        conversation.append('user', 'hello ' * 10)
+        conversation.append('assistant', 'hi ' * 10)
+    assert summaries and conversation.summary.startswith('fact0 fact1')
+    assert len(conversation.summary) <= 200
+    assert conversation.messages[0]['content'].startswith('Summary of the earlier conversation')
+
+def test_truncate_words():
+    assert truncate_words('alpha beta gamma', 11) == 'alpha beta'
+    assert truncate_words('alpha beta', 10) == 'alpha beta'
+    assert truncate_words('abcdefgh', 4) == 'abcd'
@@ -0,0 +1,70 @@
+import pytest
+from chat_engine import run_prompts
+from chatbot import ChatSession, main
+from fake_ollama import FakeOllamaServer
+from llm_cache import ResponseCache
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer() as server:
+        yield server
+
+def chat_requests(server):
+    return [body for path, body in server.requests if path == '/api/chat']
+
+def test_send_keeps_history(server):
+    session = ChatSession(model='m', host=server.url, system='Be terse.')
+    assert session.send('hello') == 'You said: hello'
+    assert session.send('again') == 'You said: again'
+    assert [m['role'] for m in session.messages] == ['system', 'user', 'assistant', 'user', 'assistant']
+    # Every turn resends the whole conversation so far
+    assert len(chat_requests(server)[-1]['messages']) == 4
+
+def test_stream_yields_reply_tokens(server):
+    session = ChatSession(model='m', host=server.url)
+    tokens = list(session.stream('one two three'))
+    assert len(tokens) > 1
+    assert ''.join(tokens) == 'You said: one two three'
+    assert session.messages[-1] == {'role': 'assistant', 'content': 'You said: one two three'}
+
+def test_stream_closed_early_keeps_partial_reply(server):
+    server.token_delay = 0.01
+    session = ChatSession(model='m', host=server.url)
+    stream = session.stream('one two three four five')
+    first = next(stream)
+    stream.close()
+    assert session.messages[-1] == {'role': 'assistant', 'content': first}
+    assert session.send('next') == 'You said: next'
+
+def test_reset_keeps_system_prompt(server):
+    session = ChatSession(model='m', host=server.url, system='Be terse.')
+    session.send('hello')
+    session.reset()
+    assert session.messages == [{'role': 'system', 'content': 'Be terse.'}]
+
+def test_cached_reply_skips_the_model(server):
+    cache = ResponseCache(path=None)
+    assert ChatSession(model='m', host=server.url, cache=cache).send('hello') == 'You said: hello'
+    assert ''.join(ChatSession(model='m', host=server.url, cache=cache).stream('hello')) == 'You said: hello'
+    assert len(chat_requests(server)) == 1
+
+def test_repl(server, monkeypatch, capsys):
+    lines = iter(['hi', '/reset', 'there', 'q'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(lines))
+    main(['--model', 'm', '--host', server.url, '--no-cache'])
+    out = capsys.readouterr().out
+    assert 'You said: hi' in out and 'You said: there' in out
+    # /reset dropped the first turn before the second one was sent
+    assert len(chat_requests(server)[-1]['messages']) == 1
+
+def test_engine_retries_busy_server(server):
+    server.failures = 2
+    results, summary = run_prompts(['a', 'b', 'c'], model='m', host=server.url, concurrency=1, backoff=0.01)
+    assert [r['content'] for r in results] == ['You said: a', 'You said: b', 'You said: c']
+    assert summary['retries'] == 2 and summary['failures'] == 0
+
+def test_engine_gives_up_after_retries(server):
+    server.failures = 10
+    results, summary = run_prompts(['a'], model='m', host=server.url, retries=1, backoff=0.01)
+    assert results[0]['content'] is None and results[0]['attempts'] == 2
+    assert summary['failures'] == 1
@@ -0,0 +1,60 @@
+import json
+import pytest
+from fake_ollama import FakeOllamaServer
+from llm_cache import ResponseCache
+from llm_gateway import FakeBackend, Gateway, GatewayError, LLMRequest, OllamaBackend, load_gateway
+
+def test_falls_back_on_errors():
+    broken, healthy = FakeBackend(name='broken', failures=1), FakeBackend(name='healthy')
+    gateway = Gateway([broken, healthy], policy='ordered')
+    response = gateway.complete('hi')
+    assert (response.backend, response.content) == ('healthy', 'You said: hi')
+    assert gateway.stats()['broken']['failures'] == 1
+
+def test_falls_back_on_timeouts():
+    gateway = Gateway([FakeBackend(name='slow', latency=5), FakeBackend(name='fast')], policy='ordered',
+                      timeout=0.1, max_workers=1)
+    # One worker is enough, the timed-out call ends instead of holding it
+    assert [gateway.complete(f'hi {i}').backend for i in range(3)] == ['fast'] * 3
+
+def test_cooldown_moves_failing_backend_last():
+    gateway = Gateway([FakeBackend(name='flaky', failures=2), FakeBackend(name='ok')], policy='ordered',
+                      failure_threshold=2, cooldown=60)
+    gateway.complete('a')
+    gateway.complete('b')
+    assert not gateway.stats()['flaky']['healthy']
+    assert gateway.candidates()[0].backend.name == 'ok'
+
+def test_fastest_policy_prefers_lower_latency():
+    gateway = Gateway([FakeBackend(name='slow', latency=0.05), FakeBackend(name='fast')])
+    for i in range(4):
+        gateway.complete(f'hi {i}')
+    assert gateway.candidates()[0].backend.name == 'fast'
+    assert gateway.stats()['fast']['latency']['count'] >= 1
+
+def test_all_backends_failing_raises():
+    gateway = Gateway([FakeBackend(failures=5)])
+    with pytest.raises(GatewayError):
+        gateway.complete('hi')
+
+def test_common_params_use_backend_names():
+    with FakeOllamaServer() as server:
+        gateway = Gateway([OllamaBackend(host=server.url)])
+        gateway.complete(LLMRequest('hi', params={'max_tokens': 5, 'stop': 'x', 'gemini': {'candidate_count': 1},
+                                                   'ollama': {'num_ctx': 64}}))
+        assert server.requests[-1][1]['options'] == {'num_predict': 5, 'stop': ['x'], 'num_ctx': 64}
+    with pytest.raises(ValueError):
+        LLMRequest('hi', params={'num_predict': 5})
+
+def test_cache_hit_skips_backend():
+    backend = FakeBackend()
+    gateway = Gateway([backend], cache=ResponseCache(path=None))
+    gateway.complete('hi')
+    assert gateway.complete('hi').cached
+    assert backend.calls == 1
+
+def test_load_gateway_from_config(tmp_path):
+    path = tmp_path / 'gateway.json'
+    path.write_text(json.dumps({'policy': 'ordered', 'backends': [{'type': 'fake', 'name': 'a', 'failures': 1},
+                                                                  {'type': 'fake', 'name': 'b'}]}))
+    assert load_gateway(str(path)).complete('hi').backend == 'b'
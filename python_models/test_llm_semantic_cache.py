@@ -0,0 +1,68 @@
+import numpy as np
+from fake_ollama import FakeOllamaServer
+from llm_gateway import FakeBackend, Gateway
+from llm_semantic_cache import SemanticCache, ollama_embedder
+
+class TableEmbedder:
+    # Known vectors per text, so similarities are exact
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        return np.array([self.vectors[text] for text in texts], dtype=np.float32)
+
+def test_similar_prompt_hits_and_other_context_misses():
+    embedder = TableEmbedder({'how does AI work': [1, 0, 0], 'explain how AI works': [0.99, 0.1, 0],
+                              'tell me a joke': [0, 1, 0]})
+    cache = SemanticCache(embedder, threshold=0.9)
+    cache.put('ollama', 'm', 'how does AI work', 'answer')
+    assert cache.get('ollama', 'm', 'explain how AI works') == 'answer'
+    assert cache.get('ollama', 'm', 'tell me a joke') is None
+    assert cache.get('ollama', 'other', 'explain how AI works') is None
+    earlier = [{'role': 'user', 'content': 'tell me a joke'}, {'role': 'assistant', 'content': 'ha'}]
+    assert cache.get('ollama', 'm', earlier + [{'role': 'user', 'content': 'how does AI work'}]) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 3)
+
+def test_put_reuses_the_vector_embedded_by_get():
+    embedder = TableEmbedder({'q': [1, 0]})
+    cache = SemanticCache(embedder)
+    cache.get('ollama', 'm', 'q')
+    cache.put('ollama', 'm', 'q', 'a')
+    assert embedder.calls == 1
+
+def test_least_recently_used_row_is_evicted():
+    embedder = TableEmbedder({'a': [1, 0, 0], 'b': [0, 1, 0], 'c': [0, 0, 1]})
+    cache = SemanticCache(embedder, capacity=2)
+    cache.put('p', 'm', 'a', 'A')
+    cache.put('p', 'm', 'b', 'B')
+    assert cache.get('p', 'm', 'a') == 'A'
+    cache.put('p', 'm', 'c', 'C')
+    assert cache.get('p', 'm', 'b') is None
+    assert cache.get('p', 'm', 'a') == 'A' and cache.get('p', 'm', 'c') == 'C'
+    assert cache.stats()['evictions'] == 1
+
+def test_ivf_partitions_find_near_duplicates():
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((2000, 32)).astype(np.float32)
+    vectors = {f'p{i}': v for i, v in enumerate(base)}
+    vectors.update({f'q{i}': v + 0.05 * rng.standard_normal(32) for i, v in enumerate(base[:100])})
+    cache = SemanticCache(TableEmbedder(vectors), threshold=0.95, capacity=2000, partitions=16, probes=3)
+    for i in range(2000):
+        cache.put('p', 'm', f'p{i}', i)
+    assert cache.centroids is not None
+    assert sum(cache.get('p', 'm', f'q{i}') == i for i in range(100)) >= 95
+
+def test_embedder_failure_is_a_miss():
+    cache = SemanticCache(ollama_embedder(host='http://127.0.0.1:9'))
+    gateway = Gateway([FakeBackend()], semantic_cache=cache)
+    assert gateway.complete('hi').content == 'You said: hi'
+    assert cache.stats()['embed_errors'] == 2
+
+def test_ollama_embedder_against_fake_server():
+    with FakeOllamaServer() as server:
+        vectors = ollama_embedder(host=server.url)(['hello there', 'hello there!'])
+    assert vectors.shape == (2, 64)
+    assert float(vectors[0] @ vectors[1]) > 0.8
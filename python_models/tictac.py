@@ -1,88 +1,458 @@
 import tkinter as tk
 from tkinter import messagebox
 import numpy as np
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 import copy
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from operator import xor
+from tictac_policy import NO_MOVE, FrozenPolicyAgent
 
-class TicTacToe:
-    def __init__(self):
-        self.board = [' '] * 9
+POLICY_FORMAT_VERSION = 1
+# Bump whenever training changes what a given seed and hyperparameters produce, so cached policies are retrained
+# 2: seeds drive a BlockRandom stream instead of the global np.random state
+TRAINER_VERSION = 2
+POLICY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policies')
+
+# Squares of every 9-bit mask, so 3x3 lookups skip the bit loop
+_NINE_BIT_SQUARES = [[i for i in range(9) if mask >> i & 1] for mask in range(1 << 9)]
+
+def squares_in(mask):
+    # Indices of the set bits, in increasing order
+    if mask < 512:
+        return _NINE_BIT_SQUARES[mask][:]
+    squares = []
+    while mask:
+        low = mask & -mask
+        squares.append(low.bit_length() - 1)
+        mask ^= low
+    return squares
+
+@lru_cache(maxsize=None)
+def symmetry_permutations(n):
+    # perm[j] is the square of the original board shown at square j of the transformed board
+    transforms = [
+        lambda r, c: (r, c),
+        lambda r, c: (n - 1 - c, r),
+        lambda r, c: (n - 1 - r, n - 1 - c),
+        lambda r, c: (c, n - 1 - r),
+        lambda r, c: (r, n - 1 - c),
+        lambda r, c: (n - 1 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (n - 1 - c, n - 1 - r),
+    ]
+    perms = []
+    for transform in transforms:
+        perm = []
+        for square in range(n * n):
+            r, c = transform(square // n, square % n)
+            perm.append(r * n + c)
+        perms.append(perm)
+    return perms
+
+@lru_cache(maxsize=None)
+def inverse_symmetry_permutations(n):
+    return [[perm.index(square) for square in range(n * n)] for perm in symmetry_permutations(n)]
+
+class BoardGeometry:
+    def __init__(self, n, k):
+        self.n = n
+        self.k = k
+        self.size = n * n
+        self.full = (1 << self.size) - 1
+        self.pow3 = [3 ** i for i in range(self.size)]
+        self.lines = []
+        for dr, dc in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+            for r in range(n):
+                for c in range(n):
+                    end_r, end_c = r + (k - 1) * dr, c + (k - 1) * dc
+                    if 0 <= end_r < n and 0 <= end_c < n:
+                        self.lines.append(tuple((r + i * dr) * n + c + i * dc for i in range(k)))
+        self.line_masks = [sum(1 << i for i in line) for line in self.lines]
+        # Only the lines through the square just played can have been completed by it
+        self.lines_through = [[mask for mask in self.line_masks if mask >> square & 1]
+                              for square in range(self.size)]
+        # Zobrist keys: zobrist[square][player] holds the key to XOR into each of the 8 symmetric hashes
+        base = np.random.default_rng(n).integers(0, 2 ** 64, size=(self.size, 2), dtype=np.uint64).tolist()
+        inverse = inverse_symmetry_permutations(n)
+        self.zobrist = [[tuple(base[perm[square]][player] for perm in inverse) for player in range(2)]
+                        for square in range(self.size)]
+
+@lru_cache(maxsize=None)
+def board_geometry(n=3, k=3):
+    return BoardGeometry(n, k)
+
+WIN_LINES = board_geometry(3, 3).lines
+# Boards are packed base 3 (0 empty, 1 X, 2 O) into an index, in range(3 ** 9) for 3x3
+POW3 = [3 ** i for i in range(9)]
+CELL_VALUES = {' ': 0, 'X': 1, 'O': 2}
+NUM_BOARDS = 3 ** 9
+
+def mirror_board(board):
+    # Swaps X and O, so an agent trained as X can play O
+    return ['X' if c == 'O' else 'O' if c == 'X' else ' ' for c in board]
+
+def board_index(board):
+    return sum(CELL_VALUES[spot] * 3 ** i for i, spot in enumerate(board))
+
+def index_board(index, size=9):
+    return [' XO'[index // 3 ** i % 3] for i in range(size)]
+
+class NInARow:
+    def __init__(self, n=3, k=None):
+        self.n = n
+        self.k = k or n
+        self.geometry = board_geometry(n, self.k)
+        # One n*n-bit integer per player, bit i set when that player holds square i
+        self.x_bits = 0
+        self.o_bits = 0
+        self.index = 0
+        # Zobrist keys are kept up to date only off 3x3, where get_state() looks them up every move;
+        # 3x3 states are keyed on index and compute the keys on demand
+        self._sym_keys = (0,) * 8 if n != 3 else None
         self.current_winner = None
 
+    @property
+    def board(self):
+        return ['X' if self.x_bits >> i & 1 else 'O' if self.o_bits >> i & 1 else ' '
+                for i in range(self.geometry.size)]
+
+    @board.setter
+    def board(self, board):
+        self.x_bits = sum(1 << i for i, spot in enumerate(board) if spot == 'X')
+        self.o_bits = sum(1 << i for i, spot in enumerate(board) if spot == 'O')
+        self.index = board_index(board)
+        if self._sym_keys is not None:
+            self._sym_keys = self._compute_sym_keys()
+
+    def _compute_sym_keys(self):
+        keys = (0,) * 8
+        zobrist = self.geometry.zobrist
+        for square in squares_in(self.x_bits):
+            keys = tuple(map(xor, keys, zobrist[square][0]))
+        for square in squares_in(self.o_bits):
+            keys = tuple(map(xor, keys, zobrist[square][1]))
+        return keys
+
+    @property
+    def sym_keys(self):
+        return self._sym_keys if self._sym_keys is not None else self._compute_sym_keys()
+
+    @property
+    def key(self):
+        return self.sym_keys[0]
+
+    def canonical_key(self):
+        # Smallest Zobrist hash over the board's symmetries, and the symmetry giving it
+        key = min(self.sym_keys)
+        return key, self.sym_keys.index(key)
+
     def copy(self):
-        new_game = TicTacToe()
-        new_game.board = self.board.copy()
+        new_game = type(self).__new__(type(self))
+        new_game.n = self.n
+        new_game.k = self.k
+        new_game.geometry = self.geometry
+        new_game.x_bits = self.x_bits
+        new_game.o_bits = self.o_bits
+        new_game.index = self.index
+        new_game._sym_keys = self._sym_keys
         new_game.current_winner = self.current_winner
         return new_game
 
     def available_moves(self):
-        return [i for i, spot in enumerate(self.board) if spot == ' ']
+        return squares_in(self.geometry.full & ~(self.x_bits | self.o_bits))
 
     def make_move(self, square, letter):
-        if self.board[square] == ' ':
-            self.board[square] = letter
-            if self.check_winner(square, letter):
-                self.current_winner = letter
-            return True
-        return False
+        bit = 1 << square
+        if (self.x_bits | self.o_bits) & bit:
+            return False
+        if letter == 'X':
+            self.x_bits |= bit
+            self.index += self.geometry.pow3[square]
+            if self._sym_keys is not None:
+                self._sym_keys = tuple(map(xor, self._sym_keys, self.geometry.zobrist[square][0]))
+        else:
+            self.o_bits |= bit
+            self.index += 2 * self.geometry.pow3[square]
+            if self._sym_keys is not None:
+                self._sym_keys = tuple(map(xor, self._sym_keys, self.geometry.zobrist[square][1]))
+        if self.check_winner(square, letter):
+            self.current_winner = letter
+        return True
 
     def check_winner(self, square, letter):
-        row_ind = square // 3
-        row = self.board[row_ind*3:(row_ind+1)*3]
-        if all([s == letter for s in row]):
-            return True
-        
-        col_ind = square % 3
-        col = [self.board[col_ind+i*3] for i in range(3)]
-        if all([s == letter for s in col]):
-            return True
-        
-        if square % 2 == 0:
-            diagonal1 = [self.board[i] for i in [0, 4, 8]]
-            if all([s == letter for s in diagonal1]):
-                return True
-            diagonal2 = [self.board[i] for i in [2, 4, 6]]
-            if all([s == letter for s in diagonal2]):
+        bits = self.x_bits if letter == 'X' else self.o_bits
+        for mask in self.geometry.lines_through[square]:
+            if bits & mask == mask:
                 return True
         return False
 
+class TicTacToe(NInARow):
+    def __init__(self):
+        super().__init__(3, 3)
+
 def get_symmetries(board):
-    symmetries = []
-    symmetries.append(board)
-    symmetries.append([board[6], board[3], board[0], board[7], board[4], board[1], board[8], board[5], board[2]])
-    symmetries.append([board[8], board[7], board[6], board[5], board[4], board[3], board[2], board[1], board[0]])
-    symmetries.append([board[2], board[5], board[8], board[1], board[4], board[7], board[0], board[3], board[6]])
-    symmetries.append([board[2], board[1], board[0], board[5], board[4], board[3], board[8], board[7], board[6]])
-    symmetries.append([board[6], board[7], board[8], board[3], board[4], board[5], board[0], board[1], board[2]])
-    symmetries.append([board[0], board[3], board[6], board[1], board[4], board[7], board[2], board[5], board[8]])
-    symmetries.append([board[8], board[5], board[2], board[7], board[4], board[1], board[6], board[3], board[0]])
-    return symmetries
+    perms = symmetry_permutations(math.isqrt(len(board)))
+    return [[board[square] for square in perm] for perm in perms]
+
+SYMMETRIES = symmetry_permutations(3)
+INVERSE_SYMMETRIES = inverse_symmetry_permutations(3)
+
+class CanonicalTable:
+    def __init__(self):
+        indices = np.arange(NUM_BOARDS)
+        cells = indices[:, None] // np.array(POW3) % 3
+        pow3 = np.array(POW3)
+        sym_indices = np.stack([cells[:, perm] @ pow3 for perm in SYMMETRIES], axis=1)
+        # The canonical form of a board is its symmetry with the smallest index
+        self.symmetries = sym_indices.argmin(axis=1).astype(np.int8)
+        self.canonical_indices, self.state_ids = np.unique(sym_indices.min(axis=1), return_inverse=True)
+        self.state_ids = self.state_ids.astype(np.int32)
+        self.num_states = len(self.canonical_indices)
+        self.cells = cells[self.canonical_indices].astype(np.int8)
+        self.lookup = list(zip(self.state_ids.tolist(), self.symmetries.tolist()))
+
+_canonical_table = None
+
+def canonical_table():
+    global _canonical_table
+    if _canonical_table is None:
+        _canonical_table = CanonicalTable()
+    return _canonical_table
+
+def new_dense_q_table():
+    # One row per canonical state, occupied squares can never be chosen
+    table = canonical_table()
+    q_table = np.zeros((table.num_states, 9), dtype=np.float32)
+    q_table[table.cells != 0] = -np.inf
+    return q_table
+
+WIN_LINE_ARRAY = np.array(WIN_LINES)
+# Maps the 24 (line, position) slots to the square they cover
+LINE_SLOT_SQUARES = np.eye(9, dtype=np.uint8)[WIN_LINE_ARRAY.ravel()]
+
+def batch_winners(boards, player):
+    return (boards[:, WIN_LINE_ARRAY] == player).all(axis=2).any(axis=1)
+
+def batch_completing_moves(boards, player):
+    # Empty squares that would give player three in a row, as an (N, 9) mask
+    lines = boards[:, WIN_LINE_ARRAY]
+    open_lines = ((lines == player).sum(axis=2) == 2) & ((lines == 0).sum(axis=2) == 1)
+    slots = (open_lines[:, :, None] & (lines == 0)).reshape(len(boards), -1)
+    return slots.astype(np.uint8) @ LINE_SLOT_SQUARES > 0
+
+class BlockRandom:
+    # Serves scalar draws from blocks of uniforms pulled from a numpy Generator
+    def __init__(self, rng=None, block_size=4096):
+        self.generator = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+        self.block_size = block_size
+        self.block = []
+        self.position = 0
+
+    def random(self):
+        if self.position == len(self.block):
+            self.block = self.generator.random(self.block_size).tolist()
+            self.position = 0
+        u = self.block[self.position]
+        self.position += 1
+        return u
+
+    def integers(self, n):
+        return int(self.random() * n)
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+def block_random(rng=None):
+    # Accepts a BlockRandom, a numpy Generator, a seed or None
+    return rng if isinstance(rng, BlockRandom) else BlockRandom(rng)
+
+default_random = BlockRandom()
+
+class ThreatTable:
+    def __init__(self):
+        cells = (np.arange(NUM_BOARDS)[:, None] // np.array(POW3) % 3).astype(np.int8)
+        bit_values = 1 << np.arange(9)
+        # 9-bit masks of the squares that complete a line, per packed board index
+        self.masks = {
+            'X': (batch_completing_moves(cells, 1) @ bit_values).astype(np.uint16),
+            'O': (batch_completing_moves(cells, 2) @ bit_values).astype(np.uint16),
+        }
+        self.lookup = {letter: masks.tolist() for letter, masks in self.masks.items()}
+
+_threat_table = None
+
+def threat_table():
+    global _threat_table
+    if _threat_table is None:
+        _threat_table = ThreatTable()
+    return _threat_table
+
+def winning_moves(game, letter):
+    if game.n == 3 and game.k == 3:
+        return squares_in(threat_table().lookup[letter][game.index])
+    own, other = (game.x_bits, game.o_bits) if letter == 'X' else (game.o_bits, game.x_bits)
+    moves = 0
+    for mask in game.geometry.line_masks:
+        missing = mask & ~own
+        # Lines the opponent hasn't touched with exactly one empty square left
+        if not mask & other and missing and not missing & (missing - 1):
+            moves |= missing
+    return squares_in(moves)
+
+def blocking_moves(game, letter):
+    return winning_moves(game, 'O' if letter == 'X' else 'X')
+
+# Scripted opponents are plain callables (game, letter, rng=None) -> square
+def random_opponent(game, letter, rng=None):
+    return (rng or default_random).choice(game.available_moves())
+
+def win_block_opponent(game, letter, rng=None):
+    # Smart opponent: win if possible, else block, else random
+    moves = winning_moves(game, letter) or blocking_moves(game, letter) or game.available_moves()
+    return (rng or default_random).choice(moves)
+
+class BoundedQTable(OrderedDict):
+    # Hashed Q-table for large boards, evicts the least recently used state past capacity
+    def __init__(self, capacity):
+        super().__init__()
+        self.capacity = capacity
+
+    def __getitem__(self, state):
+        if state in self:
+            self.move_to_end(state)
+            return super().__getitem__(state)
+        actions = {}
+        self[state] = actions
+        if len(self) > self.capacity:
+            self.popitem(last=False)
+        return actions
+
+class ReplayBuffer:
+    # Fixed-capacity ring buffer of (state id, canonical action, reward, next state id, done) transitions
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.states, self.actions, self.rewards, self.next_states, self.dones))
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size, rng=None):
+        i = block_random(rng).generator.integers(self.size, size=batch_size)
+        return self.states[i], self.actions[i], self.rewards[i], self.next_states[i], self.dones[i]
 
 class QLearningAgent:
-    def __init__(self, alpha=0.5, epsilon=0.1, gamma=0.9):
-        self.q_table = defaultdict(dict)
+    def __init__(self, alpha=0.5, epsilon=0.1, gamma=0.9, dense=False, n=3, capacity=1000000,
+                 td_lambda=None, replay_capacity=None, rng=None):
+        if dense and n != 3:
+            raise ValueError("The dense Q-table only supports 3x3 boards")
+        if replay_capacity and not dense:
+            raise ValueError("Experience replay needs a QLearningAgent with dense=True")
+        self.n = n
+        self.dense = dense
+        if dense:
+            self.q_table = new_dense_q_table()
+        elif n == 3:
+            self.q_table = defaultdict(dict)
+        else:
+            self.q_table = BoundedQTable(capacity)
+        self.inverse_symmetries = inverse_symmetry_permutations(n)
+        # Optional per (state, action) update counts, used to weight parallel merges
+        self.visits = None
         self.alpha = alpha
         self.epsilon = epsilon
         self.gamma = gamma
         self.history = []
+        # td_lambda switches from the end-of-game backup to online TD(lambda) with eligibility traces
+        self.td_lambda = td_lambda
+        self.traces = {}
+        self.buffer = ReplayBuffer(replay_capacity) if replay_capacity else None
+        self.rng = block_random(rng)
 
     def get_state(self, board):
-        symmetries = get_symmetries(board)
-        min_state = min([tuple(s) for s in symmetries])
-        return min_state
+        # Accepts a game, a board list or a packed board index, returns (state key, symmetry)
+        if self.n == 3:
+            if isinstance(board, NInARow):
+                board = board.index
+            elif not isinstance(board, int):
+                board = board_index(board)
+            return canonical_table().lookup[board]
+        # Larger boards are keyed on the canonical Zobrist hash the game keeps up to date
+        if not isinstance(board, NInARow):
+            game = NInARow(self.n)
+            game.board = index_board(board, self.n * self.n) if isinstance(board, int) else board
+            board = game
+        return board.canonical_key()
+
+    def canonical_action(self, state, action):
+        return self.inverse_symmetries[state[1]][action]
+
+    def remember(self, state, action):
+        self.history.append((state[0], self.canonical_action(state, action)))
+
+    def action_values(self, state, available_actions):
+        state_id, sym = state
+        inverse = self.inverse_symmetries[sym]
+        if self.dense:
+            row = self.q_table[state_id]
+            return [float(row[inverse[a]]) for a in available_actions]
+        return [self.q_table[state_id].get(inverse[a], 0) for a in available_actions]
+
+    def greedy_actions(self, state, available_actions):
+        state_id, sym = state
+        if self.dense:
+            row = self.q_table[state_id]
+            return [SYMMETRIES[sym][a] for a in np.flatnonzero(row == row.max())]
+        q_values = self.action_values(state, available_actions)
+        max_q = max(q_values) if q_values else 0
+        return [a for a, q in zip(available_actions, q_values) if q == max_q]
 
     def choose_action(self, state, available_actions):
-        if np.random.random() < self.epsilon:
-            return np.random.choice(available_actions)
-        else:
-            q_values = [self.q_table[state].get(a, 0) for a in available_actions]
-            max_q = max(q_values) if q_values else 0
-            best_actions = [a for a, q in zip(available_actions, q_values) if q == max_q]
-            return np.random.choice(best_actions) if best_actions else np.random.choice(available_actions)
+        if self.rng.random() < self.epsilon:
+            return self.rng.choice(available_actions)
+        best_actions = self.greedy_actions(state, available_actions)
+        # Plain ints keep the bitboards free of NumPy scalars
+        return int(self.rng.choice(best_actions or available_actions))
 
     def update_q_table(self, reward):
         self.history.reverse()
         next_max = 0
+        if self.dense:
+            for (state, action) in self.history:
+                row = self.q_table[state]
+                row[action] += self.alpha * (reward + self.gamma * next_max - row[action])
+                next_max = row.max()
+                if self.visits is not None:
+                    self.visits[state, action] += 1
+            self.history = []
+            return
         for (state, action) in self.history:
             current_q = self.q_table[state].get(action, 0)
             new_q = current_q + self.alpha * (reward + self.gamma * next_max - current_q)
@@ -90,12 +460,132 @@ class QLearningAgent:
             next_max = max(self.q_table[state].values()) if self.q_table[state] else 0
         self.history = []
 
+    def max_q(self, state_id):
+        if self.dense:
+            return float(self.q_table[state_id].max())
+        actions = self.q_table[state_id]
+        return max(actions.values()) if actions else 0
+
+    def observe(self, state, action, reward, next_state, done):
+        # One transition from an X move to X's next turn (next_state is None once the game is over)
+        action = self.canonical_action(state, action)
+        state_id = state[0]
+        next_id = next_state[0] if next_state is not None else 0
+        if self.buffer is not None:
+            self.buffer.add(state_id, action, reward, next_id, done)
+        if self.td_lambda is None:
+            return
+        target = reward if done else reward + self.gamma * self.max_q(next_id)
+        if self.dense:
+            delta = target - self.q_table[state_id, action]
+        else:
+            delta = target - self.q_table[state_id].get(action, 0)
+        self.traces[(state_id, action)] = self.traces.get((state_id, action), 0) + 1
+        decay = self.gamma * self.td_lambda
+        for (s, a), trace in self.traces.items():
+            if self.dense:
+                self.q_table[s, a] += self.alpha * delta * trace
+            else:
+                self.q_table[s][a] = self.q_table[s].get(a, 0) + self.alpha * delta * trace
+            self.traces[(s, a)] = trace * decay
+        if done:
+            self.traces = {}
+
+    def replay(self, batch_size=64):
+        # Vectorized one-step Q-learning update on a random batch from the buffer
+        if self.buffer is None or len(self.buffer) == 0:
+            return
+        states, actions, rewards, next_states, dones = self.buffer.sample(batch_size, self.rng)
+        next_max = np.where(dones, 0, self.q_table[next_states].max(axis=1))
+        current_q = self.q_table[states, actions]
+        self.q_table[states, actions] = current_q + self.alpha * (rewards + self.gamma * next_max - current_q)
+
+    def to_dense(self):
+        if self.dense:
+            return self.q_table
+        if self.n != 3:
+            raise ValueError("Only 3x3 Q-tables can be converted to the dense layout")
+        q_table = new_dense_q_table()
+        for state, actions in self.q_table.items():
+            for action, q in actions.items():
+                q_table[state, action] = q
+        return q_table
+
+    def save_q_table(self, path):
+        np.save(path, np.ascontiguousarray(self.to_dense()))
+
+    def load_q_table(self, path, mmap=True):
+        # Copy-on-write mapping: pages are read lazily and updates never touch the file
+        self.q_table = np.load(path, mmap_mode='c' if mmap else None)
+        self.dense = True
+
+    def num_states(self):
+        if self.dense:
+            return int(((self.q_table != 0) & np.isfinite(self.q_table)).any(axis=1).sum())
+        return len(self.q_table)
+
+    def table_bytes(self):
+        if self.dense:
+            return self.q_table.nbytes
+        size = sys.getsizeof(self.q_table)
+        for state, actions in self.q_table.items():
+            size += sys.getsizeof(state) + sys.getsizeof(actions)
+            size += sum(sys.getsizeof(a) + sys.getsizeof(q) for a, q in actions.items())
+        return size
+
+    def save(self, path, training=None):
+        os.makedirs(path, exist_ok=True)
+        self.save_q_table(os.path.join(path, 'q_table.npy'))
+        meta = {
+            'format_version': POLICY_FORMAT_VERSION,
+            'alpha': self.alpha,
+            'epsilon': self.epsilon,
+            'gamma': self.gamma,
+            'num_states': canonical_table().num_states,
+            'training': training or {},
+        }
+        # Metadata goes last so a half-written policy is never picked up
+        with open(os.path.join(path, 'policy.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'policy.json')) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != POLICY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported policy format {meta.get('format_version')} in {path}")
+        agent = cls(alpha=meta['alpha'], epsilon=meta['epsilon'], gamma=meta['gamma'])
+        agent.load_q_table(os.path.join(path, 'q_table.npy'), mmap=mmap)
+        return agent
+
+def agent_move(agent, game, letter):
+    # Search agents look at the game directly
+    if hasattr(agent, 'select_move'):
+        return agent.select_move(game, letter)
+    # Q-learning agents are trained as X, so they see positions as O with the symbols swapped
+    board = game.board if letter == 'X' else mirror_board(game.board)
+    return agent.choose_action(agent.get_state(board), game.available_moves())
+
+def ai_move(agent, game, letter):
+    # Take an immediate win, else block the opponent's, else proceed with Q-Learning
+    forced = winning_moves(game, letter) or blocking_moves(game, letter)
+    if forced:
+        return forced[0]
+    return agent_move(agent, game, letter)
+
 class TicTacToeGUI:
+    AI_POLL_MS = 15
+
     def __init__(self, agent):
         self.agent = agent
         self.game = TicTacToe()
         self.human_symbol = ''
         self.ai_symbol = ''
+        # The AI thinks on a worker thread, results are polled from the Tk event loop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.ai_future = None
+        self.ai_after_id = None
+        self.ai_turn_id = 0
         
         self.setup_window = tk.Tk()
         self.setup_window.title("Choose Symbol")
@@ -113,6 +603,7 @@ class TicTacToeGUI:
         
         self.window = tk.Tk()
         self.window.title(f"Tic Tac Toe - You: {self.human_symbol} vs AI: {self.ai_symbol}")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
         
         self.buttons = []
         for i in range(9):
@@ -135,48 +626,26 @@ class TicTacToeGUI:
         self.window.mainloop()
 
     def ai_turn(self):
+        self.ai_after_id = None
         self.status_label.config(text="AI is thinking...")
-        self.window.update_idletasks()
-        self.window.update()
         
         available_actions = self.game.available_moves()
         if not available_actions:
             self.game_over("It's a tie!")
             return
         
-        # Check for immediate win
-        for action in available_actions:
-            game_copy = self.game.copy()
-            if game_copy.make_move(action, self.ai_symbol):
-                if game_copy.current_winner:
-                    self.game.make_move(action, self.ai_symbol)
-                    self.buttons[action].config(text=self.ai_symbol, 
-                                              fg='red' if self.ai_symbol == 'X' else 'green',
-                                              state='disabled')
-                    self.check_game_end()
-                    return
-        
-        # Check for opponent's immediate win
-        for action in available_actions:
-            game_copy = self.game.copy()
-            if game_copy.make_move(action, self.human_symbol):
-                if game_copy.current_winner:
-                    self.game.make_move(action, self.ai_symbol)
-                    self.buttons[action].config(text=self.ai_symbol, 
-                                              fg='red' if self.ai_symbol == 'X' else 'green',
-                                              state='disabled')
-                    self.check_game_end()
-                    return
-        
-        # Proceed with Q-Learning
-        current_board = self.game.board.copy()
-        if self.ai_symbol == 'O':
-            mirrored_board = ['X' if c == 'O' else 'O' if c == 'X' else ' ' for c in current_board]
-            state = self.agent.get_state(mirrored_board)
-        else:
-            state = self.agent.get_state(current_board)
-        
-        action = self.agent.choose_action(state, available_actions)
+        self.ai_turn_id += 1
+        self.ai_future = self.executor.submit(ai_move, self.agent, self.game.copy(), self.ai_symbol)
+        self.window.after(self.AI_POLL_MS, self.poll_ai_move, self.ai_turn_id)
+
+    def poll_ai_move(self, turn_id):
+        if turn_id != self.ai_turn_id or self.ai_future is None:
+            return  # cancelled by a reset
+        if not self.ai_future.done():
+            self.window.after(self.AI_POLL_MS, self.poll_ai_move, turn_id)
+            return
+        action = self.ai_future.result()
+        self.ai_future = None
         self.game.make_move(action, self.ai_symbol)
         self.buttons[action].config(text=self.ai_symbol, 
                                   fg='red' if self.ai_symbol == 'X' else 'green',
@@ -194,14 +663,29 @@ class TicTacToeGUI:
                 btn.config(state='normal' if btn['text'] == '' else 'disabled')
 
     def human_move(self, square):
-        if self.game.make_move(square, self.human_symbol):
+        game = self.game
+        if game.make_move(square, self.human_symbol):
             self.buttons[square].config(text=self.human_symbol, 
                                       fg='blue', state='disabled')
             self.check_game_end()
-            if not self.game.current_winner and self.game.available_moves():
+            if self.game is game and not game.current_winner and game.available_moves():
                 for btn in self.buttons:
                     btn.config(state='disabled')
-                self.window.after(500, self.ai_turn)
+                self.ai_after_id = self.window.after(500, self.ai_turn)
+
+    def cancel_ai_turn(self):
+        if self.ai_after_id is not None:
+            self.window.after_cancel(self.ai_after_id)
+            self.ai_after_id = None
+        if self.ai_future is not None:
+            self.ai_future.cancel()
+            self.ai_future = None
+        self.ai_turn_id += 1
+
+    def close(self):
+        self.cancel_ai_turn()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.window.destroy()
 
     def game_over(self, message):
         for btn in self.buttons:
@@ -210,9 +694,10 @@ class TicTacToeGUI:
         if answer:
             self.reset_game()
         else:
-            self.window.destroy()
+            self.close()
 
     def reset_game(self):
+        self.cancel_ai_turn()
         self.game = TicTacToe()
         for btn in self.buttons:
             btn.config(text='', state='normal')
@@ -227,61 +712,338 @@ class TicTacToeGUI:
             self.status_label.config(text="AI's turn")
             self.ai_turn()
 
-def train(agent, episodes=10000):
+class TrainingMonitor:
+    # Pass to train()/train_batch() as monitor=..., a snapshot is taken every `every` episodes
+    FIELDS = ['episode', 'elapsed', 'episodes_per_sec', 'epsilon', 'states', 'table_bytes',
+              'win_rate', 'draw_rate', 'loss_rate']
+
+    def __init__(self, every=1000, window=1000, callback=None, sink=None):
+        self.every = every
+        self.outcomes = deque(maxlen=window)
+        self.callback = callback
+        self.sink = sink
+        self.snapshots = []
+        self.episode = 0
+        self.sink_file = None
+        self.writer = None
+
+    def start(self, agent):
+        self.agent = agent
+        self.start_time = self.last_time = time.perf_counter()
+        self.last_episode = self.episode
+        self.next_snapshot = self.episode + self.every
+        if self.sink and self.sink_file is None:
+            self.sink_file = open(self.sink, 'a', newline='')
+            if not self.sink.endswith('.jsonl'):
+                self.writer = csv.DictWriter(self.sink_file, fieldnames=self.FIELDS)
+                if self.sink_file.tell() == 0:
+                    self.writer.writeheader()
+
+    def record(self, reward):
+        self.episode += 1
+        self.outcomes.append(reward)
+        if self.episode >= self.next_snapshot:
+            self.snapshot()
+
+    def record_batch(self, rewards):
+        self.episode += len(rewards)
+        self.outcomes.extend(rewards.tolist())
+        if self.episode >= self.next_snapshot:
+            self.snapshot()
+
+    def snapshot(self):
+        now = time.perf_counter()
+        outcomes = self.outcomes
+        games = len(outcomes) or 1
+        snapshot = {
+            'episode': self.episode,
+            'elapsed': now - self.start_time,
+            'episodes_per_sec': (self.episode - self.last_episode) / max(now - self.last_time, 1e-9),
+            'epsilon': self.agent.epsilon,
+            'states': self.agent.num_states(),
+            'table_bytes': self.agent.table_bytes(),
+            'win_rate': sum(1 for r in outcomes if r > 0) / games,
+            'draw_rate': sum(1 for r in outcomes if r == 0) / games,
+            'loss_rate': sum(1 for r in outcomes if r < 0) / games,
+        }
+        self.last_time = now
+        self.last_episode = self.episode
+        self.next_snapshot = self.episode + self.every
+        self.snapshots.append(snapshot)
+        if self.callback is not None:
+            self.callback(snapshot)
+        if self.sink_file is not None:
+            if self.writer is not None:
+                self.writer.writerow(snapshot)
+            else:
+                self.sink_file.write(json.dumps(snapshot) + '\n')
+            self.sink_file.flush()
+        return snapshot
+
+    def finish(self):
+        # The sink is closed at the end of each run, start() reopens it for appending
+        if self.episode != self.last_episode:
+            self.snapshot()
+        self.close()
+        return self.snapshots[-1] if self.snapshots else None
+
+    def close(self):
+        if self.sink_file is not None:
+            self.sink_file.close()
+            self.sink_file = None
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def print_progress(snapshot):
+    print(f"episode {snapshot['episode']}: {snapshot['episodes_per_sec']:.0f} eps/s, "
+          f"{snapshot['states']} states ({snapshot['table_bytes']} bytes), "
+          f"W/D/L {snapshot['win_rate']:.2f}/{snapshot['draw_rate']:.2f}/{snapshot['loss_rate']:.2f}")
+
+def train(agent, episodes=10000, epsilon_decay=0.999, min_epsilon=0.01, seed=None, opponent=win_block_opponent,
+          k=None, replay_batch=64, monitor=None, rng=None):
+    # Plays on the agent's n x n board, k in a row to win (k defaults to n)
+    # A seed or rng drives both the agent and the opponent, so runs are reproducible
+    if seed is not None or rng is not None:
+        agent.rng = block_random(rng if rng is not None else seed)
+    rng = agent.rng
+    if monitor is not None:
+        monitor.start(agent)
+    online = agent.td_lambda is not None or agent.buffer is not None
     for _ in range(episodes):
-        game = TicTacToe()
+        game = TicTacToe() if agent.n == 3 and k in (None, 3) else NInARow(agent.n, k)
         agent.history = []
         current_player = 'X'
         reward = 0
+        previous = None
         
         while True:
-            state = agent.get_state(game.board)
+            state = agent.get_state(game)
             available_actions = game.available_moves()
             if not available_actions:
                 break
             
             if current_player == 'X':
+                if online and previous is not None:
+                    agent.observe(previous[0], previous[1], 0, state, False)
                 action = agent.choose_action(state, available_actions)
                 game.make_move(action, 'X')
-                agent.history.append((state, action))
+                agent.remember(state, action)
+                previous = (state, action)
                 
                 if game.current_winner:
                     reward = 1
                     break
                 current_player = 'O'
             else:
-                # Smart opponent: win if possible, else block, else random
-                winning_actions = []
-                for a in available_actions:
-                    game_copy = game.copy()
-                    game_copy.make_move(a, 'O')
-                    if game_copy.current_winner:
-                        winning_actions.append(a)
-                if winning_actions:
-                    action = np.random.choice(winning_actions)
-                else:
-                    blocking_actions = []
-                    for a in available_actions:
-                        game_copy = game.copy()
-                        game_copy.make_move(a, 'X')
-                        if game_copy.current_winner:
-                            blocking_actions.append(a)
-                    if blocking_actions:
-                        action = np.random.choice(blocking_actions)
-                    else:
-                        action = np.random.choice(available_actions)
-                
+                action = opponent(game, 'O', rng)
                 game.make_move(action, 'O')
                 if game.current_winner:
                     reward = -1
                     break
                 current_player = 'X'
         
-        agent.update_q_table(reward)
-        agent.epsilon = max(0.01, agent.epsilon * 0.999)
+        if online and previous is not None:
+            agent.observe(previous[0], previous[1], reward, None, True)
+        if agent.td_lambda is None:
+            agent.update_q_table(reward)
+        else:
+            agent.history = []
+        if agent.buffer is not None and replay_batch:
+            agent.replay(replay_batch)
+        agent.epsilon = max(min_epsilon, agent.epsilon * epsilon_decay)
+        if monitor is not None:
+            monitor.record(reward)
+    if monitor is not None:
+        return monitor.finish()
+
+def batch_update(agent, states, actions, lengths, rewards):
+    # Same backward pass as update_q_table, one step for every finished game at a time
+    q_table = agent.q_table
+    next_max = np.zeros(len(lengths), dtype=np.float32)
+    for step in range(int(lengths.max(initial=0))):
+        games = np.flatnonzero(lengths > step)
+        positions = lengths[games] - 1 - step
+        s = states[games, positions]
+        a = actions[games, positions]
+        current_q = q_table[s, a]
+        q_table[s, a] = current_q + agent.alpha * (rewards[games] + agent.gamma * next_max[games] - current_q)
+        next_max[games] = q_table[s].max(axis=1)
+        if agent.visits is not None:
+            np.add.at(agent.visits, (s, a), 1)
+
+def train_batch(agent, episodes=10000, batch_size=1024, epsilon_decay=0.999, min_epsilon=0.01, seed=None,
+                monitor=None, rng=None):
+    # Plays batch_size games in lockstep against the win/block/random opponent
+    if not agent.dense:
+        raise ValueError("train_batch needs a QLearningAgent with dense=True")
+    if monitor is not None:
+        monitor.start(agent)
+    # Same as train(): a seed or rng replaces the agent's stream, otherwise the agent's own one is used
+    if seed is not None or rng is not None:
+        agent.rng = block_random(rng if rng is not None else seed)
+    rng = agent.rng.generator
+    table = canonical_table()
+    inverse = np.array(INVERSE_SYMMETRIES)
+    pow3 = np.array(POW3)
+    threats = threat_table().masks
+    square_bits = np.arange(9, dtype=np.uint16)
+    n = min(batch_size, episodes)
+    games = np.arange(n)
+    boards = np.zeros((n, 9), dtype=np.int8)
+    states = np.zeros((n, 5), dtype=np.int32)
+    actions = np.zeros((n, 5), dtype=np.int8)
+    lengths = np.zeros(n, dtype=np.int64)
+    finished_episodes = 0
+
+    while finished_episodes < episodes:
+        index = boards @ pow3
+        state_ids = table.state_ids[index]
+        syms = table.symmetries[index]
+
+        # Agent (X): epsilon-greedy with random tie-breaking
+        legal = boards == 0
+        q_values = np.take_along_axis(agent.q_table[state_ids], inverse[syms], axis=1)
+        noise = rng.random((n, 9))
+        greedy = np.where(q_values == q_values.max(axis=1, keepdims=True), noise, -1)
+        explore = np.where(legal, noise, -1)
+        action = np.where(rng.random(n) < agent.epsilon, explore.argmax(axis=1), greedy.argmax(axis=1))
+        states[games, lengths] = state_ids
+        actions[games, lengths] = inverse[syms, action]
+        lengths += 1
+        boards[games, action] = 1
+        index += pow3[action]
+
+        rewards = batch_winners(boards, 1).astype(np.float32)
+        done = (rewards > 0) | (boards != 0).all(axis=1)
+
+        # Smart opponent (O): win if possible, else block, else random
+        playing = np.flatnonzero(~done)
+        if len(playing):
+            current = boards[playing]
+            winning = threats['O'][index[playing]][:, None] >> square_bits & 1 > 0
+            blocking = threats['X'][index[playing]][:, None] >> square_bits & 1 > 0
+            candidates = np.where(winning.any(axis=1, keepdims=True), winning,
+                                  np.where(blocking.any(axis=1, keepdims=True), blocking, current == 0))
+            reply = np.where(candidates, rng.random(candidates.shape), -1).argmax(axis=1)
+            boards[playing, reply] = 2
+            lost = playing[batch_winners(boards[playing], 2)]
+            rewards[lost] = -1
+            done[lost] = True
+            done[playing[(boards[playing] != 0).all(axis=1)]] = True
+
+        # Learn from finished games and recycle their slots
+        finished = np.flatnonzero(done)
+        if len(finished):
+            counted = finished[:episodes - finished_episodes]
+            batch_update(agent, states[counted], actions[counted], lengths[counted], rewards[counted])
+            finished_episodes += len(counted)
+            agent.epsilon = max(min_epsilon, agent.epsilon * epsilon_decay ** len(counted))
+            if monitor is not None:
+                monitor.record_batch(rewards[counted])
+            boards[finished] = 0
+            lengths[finished] = 0
+    if monitor is not None:
+        return monitor.finish()
+
+def _parallel_worker(q_table, alpha, gamma, epsilon, episodes, batch_size, epsilon_decay, min_epsilon, seed):
+    agent = QLearningAgent(alpha=alpha, epsilon=epsilon, gamma=gamma)
+    agent.q_table = q_table
+    agent.dense = True
+    agent.visits = np.zeros(q_table.shape, dtype=np.int64)
+    start = time.perf_counter()
+    train_batch(agent, episodes, batch_size=batch_size, epsilon_decay=epsilon_decay,
+                min_epsilon=min_epsilon, seed=seed)
+    return agent.q_table, agent.visits, agent.epsilon, time.perf_counter() - start
+
+def merge_q_tables(tables, visits=None):
+    # Averages worker tables, weighted by how often each entry was updated when visits are given
+    tables = np.stack(tables)
+    illegal = np.isneginf(tables[0])
+    values = np.where(illegal, 0, tables)
+    if visits is None:
+        merged = values.mean(axis=0)
+    else:
+        weights = np.stack(visits).astype(np.float64)
+        total = weights.sum(axis=0)
+        weighted = (values * weights).sum(axis=0) / np.maximum(total, 1)
+        merged = np.where(total > 0, weighted, values.mean(axis=0))
+    merged[illegal] = -np.inf
+    return merged.astype(np.float32)
+
+def train_parallel(agent, episodes=10000, workers=4, sync_every=2000, merge='mean', batch_size=1024,
+                   epsilon_decay=0.999, min_epsilon=0.01, seed=0):
+    # Independent train_batch workers whose tables are merged every sync_every episodes per worker
+    if not agent.dense:
+        raise ValueError("train_parallel needs a QLearningAgent with dense=True")
+    if merge not in ('mean', 'visits'):
+        raise ValueError(f"Unknown merge strategy: {merge}")
+    worker_seeds = np.random.SeedSequence(seed).spawn(workers)
+    stats = [{'worker': i, 'episodes': 0, 'seconds': 0.0} for i in range(workers)]
+    remaining = episodes
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while remaining > 0:
+            round_episodes = min(sync_every * workers, remaining)
+            shares = [round_episodes // workers + (i < round_episodes % workers) for i in range(workers)]
+            futures = [pool.submit(_parallel_worker, np.asarray(agent.q_table), agent.alpha, agent.gamma,
+                                   agent.epsilon, share, batch_size, epsilon_decay, min_epsilon,
+                                   worker_seeds[i].spawn(1)[0])
+                       for i, share in enumerate(shares) if share]
+            results = [future.result() for future in futures]
+            tables, visits, epsilons, seconds = zip(*results)
+            agent.q_table[:] = merge_q_tables(tables, visits if merge == 'visits' else None)
+            if agent.visits is not None:
+                agent.visits += sum(visits)
+            agent.epsilon = float(np.mean(epsilons))
+            for stat, share, elapsed in zip(stats, shares, seconds):
+                stat['episodes'] += share
+                stat['seconds'] += elapsed
+            remaining -= round_episodes
+    for stat in stats:
+        stat['episodes_per_sec'] = stat['episodes'] / stat['seconds'] if stat['seconds'] else 0.0
+    return stats
+
+def export_policy(agent, path=None):
+    # Compiles the greedy policy for X into one move byte per packed board, see tictac_policy
+    table = canonical_table()
+    q_table = np.asarray(agent.to_dense())
+    best = q_table.argmax(axis=1)
+    best[np.isneginf(q_table).all(axis=1)] = -1
+    canonical_moves = best[table.state_ids]
+    moves = np.array(SYMMETRIES)[table.symmetries, np.maximum(canonical_moves, 0)]
+    moves[canonical_moves < 0] = NO_MOVE
+    policy = FrozenPolicyAgent(moves.astype(np.uint8).tobytes())
+    if path is not None:
+        policy.save(path)
+    return policy
+
+def policy_cache_key(**params):
+    params = dict(params, format_version=POLICY_FORMAT_VERSION, trainer_version=TRAINER_VERSION)
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def load_or_train(episodes=20000, alpha=0.5, gamma=0.9, epsilon=0.1, epsilon_decay=0.999,
+                  min_epsilon=0.01, seed=0, cache_dir=POLICY_CACHE_DIR, frozen=False):
+    # frozen=True returns the exported greedy FrozenPolicyAgent instead of the Q-learning agent
+    params = dict(episodes=episodes, alpha=alpha, gamma=gamma, epsilon=epsilon,
+                  epsilon_decay=epsilon_decay, min_epsilon=min_epsilon, seed=seed)
+    path = os.path.join(cache_dir, policy_cache_key(**params))
+    frozen_path = os.path.join(path, 'greedy_policy.bin')
+    if frozen and os.path.exists(frozen_path):
+        return FrozenPolicyAgent.load(frozen_path)
+    if os.path.exists(os.path.join(path, 'policy.json')):
+        agent = QLearningAgent.load(path)
+    else:
+        agent = QLearningAgent(alpha=alpha, epsilon=epsilon, gamma=gamma, dense=True)
+        train(agent, episodes=episodes, epsilon_decay=epsilon_decay, min_epsilon=min_epsilon, seed=seed)
+        agent.save(path, training=params)
+    if frozen:
+        return export_policy(agent, frozen_path)
+    return agent
 
 if __name__ == "__main__":
-    agent = QLearningAgent(epsilon=0.1)
-    train(agent, episodes=20000)
-    agent.epsilon = 0
+    agent = load_or_train(episodes=20000, epsilon=0.1, frozen=True)
     TicTacToeGUI(agent)
\ No newline at end of file
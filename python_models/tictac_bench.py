@@ -0,0 +1,133 @@
+import argparse
+import json
+import platform
+import time
+import numpy as np
+from tictac import (TicTacToe, QLearningAgent, agent_move, block_random, load_or_train, random_opponent,
+                    win_block_opponent)
+from tictac_mcts import MCTSAgent
+from tictac_solver import optimal_agreement, perfect_opponent
+
+OPPONENTS = {
+    'random': random_opponent,
+    'win_block': win_block_opponent,
+    'perfect': perfect_opponent,
+}
+
+def play_match(agent, opponent, games=2000, agent_letter='X', rng=None):
+    # Greedy agent against a scripted opponent, X always moves first
+    opponent_letter = 'O' if agent_letter == 'X' else 'X'
+    results = {'wins': 0, 'draws': 0, 'losses': 0}
+    decisions = 0
+    decision_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(games):
+        game = TicTacToe()
+        current_player = 'X'
+        while game.available_moves() and not game.current_winner:
+            if current_player == agent_letter:
+                tick = time.perf_counter()
+                action = agent_move(agent, game, agent_letter)
+                decision_seconds += time.perf_counter() - tick
+                decisions += 1
+            else:
+                action = opponent(game, opponent_letter, rng)
+            game.make_move(action, current_player)
+            current_player = 'O' if current_player == 'X' else 'X'
+        if game.current_winner == agent_letter:
+            results['wins'] += 1
+        elif game.current_winner:
+            results['losses'] += 1
+        else:
+            results['draws'] += 1
+    elapsed = time.perf_counter() - start
+    results['win_rate'] = results['wins'] / games
+    results['draw_rate'] = results['draws'] / games
+    results['loss_rate'] = results['losses'] / games
+    results['games_per_sec'] = games / elapsed
+    results['mean_decision_us'] = decision_seconds / decisions * 1e6 if decisions else 0.0
+    return results
+
+def describe_agent(agent, agent_letter):
+    if isinstance(agent, MCTSAgent):
+        return {
+            'type': 'mcts',
+            'rollouts': agent.rollouts,
+            'time_limit': agent.time_limit,
+            'max_nodes': agent.max_nodes,
+            'prior': agent.prior_agent is not None,
+        }
+    if not isinstance(agent, QLearningAgent):
+        return {'type': 'frozen'}
+    return {
+        'type': 'q_learning',
+        'alpha': agent.alpha,
+        'gamma': agent.gamma,
+        'backend': 'dense' if agent.dense else 'dict',
+        'states': agent.num_states(),
+        'table_bytes': agent.table_bytes(),
+        'optimal_agreement': optimal_agreement(agent, agent_letter),
+    }
+
+def run_benchmark(agent, opponents=('random', 'win_block', 'perfect'), games=2000, agent_letter='X', seed=0):
+    # One seeded stream shared by the agent and the opponents makes reports reproducible
+    rng = block_random(seed)
+    saved_rng = agent.__dict__.get('rng')
+    agent.rng = rng
+    epsilon = agent.epsilon
+    agent.epsilon = 0
+    try:
+        report = {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'seed': seed,
+            'games': games,
+            'agent_letter': agent_letter,
+            'agent': describe_agent(agent, agent_letter),
+            'results': {name: play_match(agent, OPPONENTS[name], games, agent_letter, rng) for name in opponents},
+        }
+    finally:
+        agent.epsilon = epsilon
+        if saved_rng is None:
+            del agent.rng
+        else:
+            agent.rng = saved_rng
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark a tic-tac-toe Q-learning agent")
+    parser.add_argument('--agent', choices=['q', 'mcts'], default='q')
+    parser.add_argument('--rollouts', type=int,
+                        help="MCTS rollouts per move, 1000 unless --time-limit is given")
+    parser.add_argument('--time-limit', type=float, help="MCTS seconds per move")
+    parser.add_argument('--policy', help="saved policy directory, trains (or reuses the cache) when omitted")
+    parser.add_argument('--episodes', type=int, default=20000)
+    parser.add_argument('--train-seed', type=int, default=0)
+    parser.add_argument('--games', type=int, default=2000)
+    parser.add_argument('--opponents', default=','.join(OPPONENTS))
+    parser.add_argument('--play-as', choices=['X', 'O'], default='X')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    opponents = args.opponents.split(',')
+    unknown = [name for name in opponents if name not in OPPONENTS]
+    if unknown:
+        parser.error(f"unknown opponents: {', '.join(unknown)}")
+    if args.policy:
+        agent = QLearningAgent.load(args.policy)
+    else:
+        agent = load_or_train(episodes=args.episodes, seed=args.train_seed)
+    if args.agent == 'mcts':
+        agent = MCTSAgent(rollouts=args.rollouts, time_limit=args.time_limit, prior_agent=agent, seed=args.seed)
+
+    report = run_benchmark(agent, opponents, args.games, args.play_as, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import itertools
+import time
+import numpy as np
+from tictac import block_random, mirror_board
+
+PLAYER_CODES = {'X': 1, 'O': 2}
+# Rollouts per move when neither rollouts nor time_limit is given
+DEFAULT_ROLLOUTS = 1000
+
+def other_player(letter):
+    return 'O' if letter == 'X' else 'X'
+
+class MCTSAgent:
+    # UCT search over a node pool kept in flat NumPy arrays, children of a node are stored contiguously
+    def __init__(self, rollouts=None, time_limit=None, exploration=1.4, max_nodes=100000,
+                 prior_agent=None, prior_weight=1.0, rollout_epsilon=0.2, seed=None):
+        self.rollouts = rollouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.prior_agent = prior_agent
+        self.prior_weight = prior_weight
+        self.rollout_epsilon = rollout_epsilon
+        self.rng = block_random(seed)
+        self.epsilon = 0
+
+        self.parent = np.empty(max_nodes, dtype=np.int32)
+        self.move = np.empty(max_nodes, dtype=np.int16)
+        self.player = np.empty(max_nodes, dtype=np.int8)
+        self.first_child = np.empty(max_nodes, dtype=np.int32)
+        self.num_children = np.empty(max_nodes, dtype=np.int16)
+        self.visits = np.empty(max_nodes, dtype=np.float64)
+        self.value = np.empty(max_nodes, dtype=np.float64)
+        self.prior = np.empty(max_nodes, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.node_count = 0
+        self.root = -1
+        self.root_game = None
+        self.root_letter = None
+
+    def _new_root(self, game, letter):
+        self.reset()
+        self.root = self._allocate(1, -1, [-1], other_player(letter), [1.0])
+        self.root_game = game.copy()
+        self.root_letter = letter
+
+    def _allocate(self, count, parent, moves, letter, priors):
+        start = self.node_count
+        end = start + count
+        if end > self.max_nodes:
+            return -1
+        self.parent[start:end] = parent
+        self.move[start:end] = moves
+        # player is whoever moved into the node, values are from their point of view
+        self.player[start:end] = PLAYER_CODES[letter]
+        self.first_child[start:end] = -1
+        self.num_children[start:end] = 0
+        self.visits[start:end] = 0
+        self.value[start:end] = 0
+        self.prior[start:end] = priors
+        self.node_count = end
+        return start
+
+    def _priors(self, game, letter, moves):
+        if self.prior_agent is None:
+            return np.full(len(moves), 1.0 / len(moves))
+        board = game.board if letter == 'X' else mirror_board(game.board)
+        values = np.array(self.prior_agent.action_values(self.prior_agent.get_state(board), moves))
+        weights = np.exp(5 * (values - values.max()))
+        return weights / weights.sum()
+
+    def _expand(self, node, game, letter):
+        moves = game.available_moves()
+        start = self._allocate(len(moves), node, moves, letter, self._priors(game, letter, moves))
+        if start < 0:
+            return False
+        self.first_child[node] = start
+        self.num_children[node] = len(moves)
+        return True
+
+    def _select_child(self, node):
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        unvisited = visits == 0
+        if unvisited.any():
+            return start + int(np.argmax(np.where(unvisited, self.prior[start:end], -1)))
+        scores = (self.value[start:end] / visits
+                  + self.exploration * np.sqrt(np.log(self.visits[node]) / visits)
+                  + self.prior_weight * self.prior[start:end] / (1 + visits))
+        return start + int(np.argmax(scores))
+
+    def _rollout(self, game, letter):
+        while not game.current_winner:
+            moves = game.available_moves()
+            if not moves:
+                return 0
+            if self.prior_agent is not None and self.rng.random() >= self.rollout_epsilon:
+                board = game.board if letter == 'X' else mirror_board(game.board)
+                moves = self.prior_agent.greedy_actions(self.prior_agent.get_state(board), moves) or moves
+            game.make_move(moves[self.rng.integers(len(moves))], letter)
+            letter = other_player(letter)
+        return PLAYER_CODES[game.current_winner]
+
+    def _search_once(self):
+        node = self.root
+        game = self.root_game.copy()
+        letter = self.root_letter
+        while not game.current_winner and game.available_moves():
+            if self.first_child[node] < 0 and not self._expand(node, game, letter):
+                break
+            node = self._select_child(node)
+            game.make_move(int(self.move[node]), letter)
+            letter = other_player(letter)
+            if self.visits[node] == 0:
+                break
+
+        winner = self._rollout(game, letter)
+        while True:
+            self.visits[node] += 1
+            if winner == 0:
+                self.value[node] += 0.5
+            elif winner == self.player[node]:
+                self.value[node] += 1
+            if node == self.root:
+                break
+            node = self.parent[node]
+
+    def _sync(self, game, letter):
+        # Walk down from the old root along the moves played since, keeping that subtree
+        root_game = self.root_game
+        if (root_game is None or root_game.n != game.n or root_game.x_bits & ~game.x_bits
+                or root_game.o_bits & ~game.o_bits):
+            self._new_root(game, letter)
+            return
+        new_bits = {'X': game.x_bits & ~root_game.x_bits, 'O': game.o_bits & ~root_game.o_bits}
+        node = self.root
+        current = self.root_letter
+        while new_bits['X'] or new_bits['O']:
+            bits = new_bits[current]
+            start = self.first_child[node]
+            if not bits or start < 0:
+                self._new_root(game, letter)
+                return
+            square = (bits & -bits).bit_length() - 1
+            moves = self.move[start:start + self.num_children[node]]
+            matches = np.flatnonzero(moves == square)
+            if not len(matches):
+                self._new_root(game, letter)
+                return
+            node = start + int(matches[0])
+            new_bits[current] ^= 1 << square
+            current = other_player(current)
+        if current != letter:
+            self._new_root(game, letter)
+            return
+        self._reroot(node, game.copy(), letter)
+
+    def _reroot(self, node, game, letter):
+        self.root = node
+        self.root_game = game
+        self.root_letter = letter
+        if self.node_count > self.max_nodes // 2:
+            self._compact()
+
+    def _compact(self):
+        # Breadth-first copy of the live subtree to the front of the pool keeps sibling blocks contiguous
+        order = [self.root]
+        for node in order:
+            start = self.first_child[node]
+            if start >= 0:
+                order.extend(range(start, start + self.num_children[node]))
+        order = np.array(order)
+        remap = np.full(self.node_count, -1, dtype=np.int32)
+        remap[order] = np.arange(len(order))
+        for array in (self.move, self.player, self.num_children, self.visits, self.value, self.prior):
+            array[:len(order)] = array[order]
+        first_child = self.first_child[order]
+        self.first_child[:len(order)] = np.where(first_child >= 0, remap[np.maximum(first_child, 0)], -1)
+        parent = self.parent[order]
+        self.parent[:len(order)] = np.where(parent >= 0, remap[np.maximum(parent, 0)], -1)
+        self.parent[0] = -1
+        self.root = 0
+        self.node_count = len(order)
+
+    def select_move(self, game, letter):
+        self._sync(game, letter)
+        deadline = time.perf_counter() + self.time_limit if self.time_limit else None
+        # A time limit on its own searches until the deadline, rollouts caps it when both are set
+        if self.rollouts is not None:
+            rollouts = range(self.rollouts)
+        else:
+            rollouts = itertools.count() if deadline is not None else range(DEFAULT_ROLLOUTS)
+        for i in rollouts:
+            if deadline is not None and i and time.perf_counter() > deadline:
+                break
+            self._search_once()
+
+        start = self.first_child[self.root]
+        if start < 0:
+            moves = game.available_moves()
+            return moves[self.rng.integers(len(moves))]
+        child = start + int(np.argmax(self.visits[start:start + self.num_children[self.root]]))
+        move = int(self.move[child])
+        next_game = game.copy()
+        next_game.make_move(move, letter)
+        self._reroot(child, next_game, other_player(letter))
+        return move
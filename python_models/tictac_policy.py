@@ -0,0 +1,45 @@
+# Frozen greedy policies, kept free of NumPy so the GUI can play from one small file
+POLICY_MAGIC = b'TTTP'
+POLICY_VERSION = 1
+NUM_BOARDS = 3 ** 9
+NO_MOVE = 255
+POW3 = [3 ** i for i in range(9)]
+
+def mirrored_index(game):
+    # Packed index of the board with X and O swapped
+    index = 0
+    for i in range(9):
+        if game.x_bits >> i & 1:
+            index += 2 * POW3[i]
+        elif game.o_bits >> i & 1:
+            index += POW3[i]
+    return index
+
+class FrozenPolicyAgent:
+    # moves[i] is the greedy move for X on the board with packed index i, already mapped back from its symmetry
+    def __init__(self, moves):
+        if len(moves) != NUM_BOARDS:
+            raise ValueError(f"Expected {NUM_BOARDS} moves, got {len(moves)}")
+        self.moves = moves
+        self.epsilon = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        header = len(POLICY_MAGIC) + 1
+        if data[:len(POLICY_MAGIC)] != POLICY_MAGIC:
+            raise ValueError(f"{path} is not a frozen tic-tac-toe policy")
+        if data[len(POLICY_MAGIC)] != POLICY_VERSION:
+            raise ValueError(f"Unsupported frozen policy version {data[len(POLICY_MAGIC)]} in {path}")
+        return cls(data[header:])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(POLICY_MAGIC + bytes([POLICY_VERSION]) + bytes(self.moves))
+
+    def select_move(self, game, letter):
+        move = self.moves[game.index if letter == 'X' else mirrored_index(game)]
+        if move == NO_MOVE or (game.x_bits | game.o_bits) >> move & 1:
+            return game.available_moves()[0]
+        return move
@@ -0,0 +1,145 @@
+import os
+import numpy as np
+from tictac import (TicTacToe, NUM_BOARDS, POLICY_CACHE_DIR, board_index, index_board,
+                    canonical_table, default_random, mirror_board, squares_in)
+
+SOLVER_FORMAT_VERSION = 1
+SOLVER_CACHE_PATH = os.path.join(POLICY_CACHE_DIR, f'perfect_play_v{SOLVER_FORMAT_VERSION}.npz')
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+def other_player(letter):
+    return 'O' if letter == 'X' else 'X'
+
+def player_to_move(game):
+    return 'X' if game.x_bits.bit_count() == game.o_bits.bit_count() else 'O'
+
+class NegamaxSolver:
+    def __init__(self):
+        # Transposition table keyed on the canonical state id, so symmetric boards share entries
+        self.transpositions = {}
+
+    def negamax(self, game, letter, alpha=-1, beta=1):
+        # Value for the side to move: 1 win, 0 draw, -1 loss
+        if game.current_winner:
+            return -1
+        moves = game.available_moves()
+        if not moves:
+            return 0
+        key = canonical_table().lookup[game.index][0]
+        entry = self.transpositions.get(key)
+        original_alpha = alpha
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        best = -2
+        for move in moves:
+            child = game.copy()
+            child.make_move(move, letter)
+            best = max(best, -self.negamax(child, other_player(letter), -beta, -alpha))
+            alpha = max(alpha, best)
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.transpositions[key] = (best, flag)
+        return best
+
+    def solve(self):
+        # Exact values and optimal-move masks for every reachable board, by packed index
+        values = np.zeros(NUM_BOARDS, dtype=np.int8)
+        best_masks = np.zeros(NUM_BOARDS, dtype=np.uint16)
+        reachable = np.zeros(NUM_BOARDS, dtype=bool)
+        stack = [TicTacToe()]
+        while stack:
+            game = stack.pop()
+            if reachable[game.index]:
+                continue
+            reachable[game.index] = True
+            if game.current_winner or not game.available_moves():
+                continue
+            letter = player_to_move(game)
+            scores = {}
+            for move in game.available_moves():
+                child = game.copy()
+                child.make_move(move, letter)
+                scores[move] = -self.negamax(child, other_player(letter), -1, 1)
+                stack.append(child)
+            value = max(scores.values())
+            values[game.index] = value
+            best_masks[game.index] = sum(1 << move for move, score in scores.items() if score == value)
+        return PerfectPlay(values, best_masks, reachable)
+
+class PerfectPlay:
+    def __init__(self, values, best_masks, reachable):
+        self.values = values
+        self.best_masks = best_masks
+        self.reachable = reachable
+        self.best_lookup = best_masks.tolist()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, values=self.values, best_masks=self.best_masks, reachable=self.reachable)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['values'], data['best_masks'], data['reachable'])
+
+    def best_moves(self, board):
+        # Accepts a TicTacToe, a board list or a packed board index
+        if isinstance(board, TicTacToe):
+            board = board.index
+        elif not isinstance(board, int):
+            board = board_index(board)
+        return squares_in(self.best_lookup[board])
+
+    def value(self, board):
+        if isinstance(board, TicTacToe):
+            board = board.index
+        elif not isinstance(board, int):
+            board = board_index(board)
+        return int(self.values[board])
+
+_perfect_play = None
+
+def perfect_play(cache_path=SOLVER_CACHE_PATH):
+    # Solved once per process, and once per machine through the on-disk cache
+    global _perfect_play
+    if _perfect_play is None:
+        if cache_path and os.path.exists(cache_path):
+            _perfect_play = PerfectPlay.load(cache_path)
+        else:
+            _perfect_play = NegamaxSolver().solve()
+            if cache_path:
+                _perfect_play.save(cache_path)
+    return _perfect_play
+
+def perfect_opponent(game, letter, rng=None):
+    # Drop-in for train(opponent=...): a random choice among the optimal moves
+    return (rng or default_random).choice(perfect_play().best_moves(game))
+
+def optimal_agreement(agent, letter='X'):
+    # Expected fraction of positions, with letter to move, where the greedy agent picks an optimal move
+    solution = perfect_play()
+    agreement = 0.0
+    positions = 0
+    for index in np.flatnonzero(solution.reachable & (solution.best_masks > 0)).tolist():
+        game = TicTacToe()
+        game.board = index_board(index)
+        if player_to_move(game) != letter:
+            continue
+        board = game.board if letter == 'X' else mirror_board(game.board)
+        greedy = agent.greedy_actions(agent.get_state(board), game.available_moves())
+        best = solution.best_moves(index)
+        agreement += sum(move in best for move in greedy) / len(greedy)
+        positions += 1
+    return agreement / positions if positions else 0.0